@@ -16,14 +16,20 @@ limitations under the License.
 """
 
 import argparse
+import bisect
 import json
 import os
 import sys
 import hashlib
 import datetime
+import multiprocessing
 import operator
 import re
 
+from bandit_tools import profiling
+from bandit_tools.bloom import BloomFilter
+from bandit_tools.external_sort import ExternalSorter
+
 CODE_LINE = re.compile(r'(\d+) *(\w+|#|\'|\")')
 TS_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
 BASE_DICT = {
@@ -38,6 +44,8 @@ BASE_DICT = {
     "SEVERITY.LOW": 0,
     "SEVERITY.UNDEFINED": 0,
 }
+LEVELS = ["UNDEFINED", "LOW", "MEDIUM", "HIGH"]
+LINE_KEYS = ["line_number", "line_range", "col_offset", "end_col_offset"]
 
 
 def zip_report(report):
@@ -76,14 +84,25 @@ def filter_code(value):
 
 class BanditReport(object):
 
-    def __init__(self):
+    def __init__(self, profiler=None, memory_budget=None, bloom_filter=None):
+        """
+        :param profiler: profiling.Profiler to measure the phases
+        :param memory_budget: bytes of results kept on memory, the rest are sorted on temporary files
+        :param bloom_filter: bloom.BloomFilter used instead of the hashes dict, a false positive drops a new hit
+        """
+        self.profiler = profiler or profiling.NULL_PROFILER
+        if self.profiler.enabled:
+            self.get_hash = self.profiler.timed('hash', BanditReport.get_hash)
         self.errors = []
-        self._result = []
+        self._result = ExternalSorter(memory_budget) if memory_budget else []
         self._metrics = {}
         self._hist = {}
-        self._hist_hash = []
+        self._hist_hash = {}
+        self.bloom_filter = bloom_filter
+        self._indexes = None
         self.use_mix_data = True
         self.ignore_lines = True
+        self.count_occurrences = True
 
     @staticmethod
     def get_hash(hit_data, ignore_lines=True):
@@ -92,11 +111,13 @@ class BanditReport(object):
         for key in sorted(keys):
             if key == 'code':
                 h.update(filter_code(hit_data[key]))
-            elif key in ['line_number', 'line_range']:
+            elif key in LINE_KEYS:
                 if not ignore_lines:
                     h.update(str(hit_data[key]).encode('utf8'))
-            else:
+            elif hasattr(hit_data[key], 'encode'):
                 h.update(hit_data[key].encode('utf8'))
+            else:
+                h.update(json.dumps(hit_data[key], sort_keys=True).encode('utf8'))
         return h.hexdigest()
 
     @property
@@ -111,19 +132,39 @@ class BanditReport(object):
         return metrics
 
     def to_dict(self):
+        """On external sort mode the results are an iterable merged from the temporary files"""
+        results = self._result
+        if isinstance(results, list):
+            with self.profiler.phase('sort'):
+                results = sorted(results, key=operator.itemgetter('filename'))
         return {
             'metrics': self.metrics,
             'generated_at': self.generated_at,
             'errors': self.errors,
-            'results': sorted(self._result, key=operator.itemgetter('filename'))
+            'results': results
         }
 
-    def add_hit(self, result):
-        hit_hash = BanditReport.get_hash(result, self.ignore_lines)
-        if hit_hash in self._hist_hash:
+    def add_hit(self, result, occurrence=1):
+        """
+        Add the hit if its hash has been added less than occurrence times.
+        So the nth occurrence of the same risky code on a report is added only
+        if no previous report has it n times.
+        """
+        hit_hash = self.get_hash(result, self.ignore_lines)
+        self._add_hit(result, hit_hash, occurrence)
+
+    def _add_hit(self, result, hit_hash, occurrence, use_filter=True):
+        if self.bloom_filter is not None:
+            if not self.bloom_filter.add('{}:{}'.format(hit_hash, occurrence)) and use_filter:
+                return
+        elif self._hist_hash.get(hit_hash, 0) >= occurrence:
             return
-        self._hist_hash.append(hit_hash)
+        else:
+            self._hist_hash[hit_hash] = occurrence
+        self._append_hit(result)
 
+    def _append_hit(self, result):
+        """Add the hit without checking duplicates"""
         conf_key = "CONFIDENCE.{}".format(result["issue_confidence"])
         sev_key = "SEVERITY.{}".format(result["issue_severity"])
 
@@ -133,6 +174,7 @@ class BanditReport(object):
         file_data[sev_key] += 1
 
         self._result.append(result)
+        self._indexes = None
 
     def add_file(self, filename, lines_of_code, num_nosec):
         if filename in self._metrics:
@@ -144,36 +186,259 @@ class BanditReport(object):
         self._metrics[filename] = BASE_DICT.copy()
         self._metrics[filename]['loc'] = lines_of_code
         self._metrics[filename]['nosec'] = num_nosec
+        self._indexes = None
+
+    def add_report(self, report, use_filter=True):
+        """
+        :param use_filter: with a bloom_filter, drop the hits already on it,
+        when False the hits are always added and only inserted on the filter
+        """
+        with self.profiler.phase('files'):
+            for filename in report['metrics']:
+                if filename != "_totals":
+                    lines_of_code = report['metrics'][filename]['loc']
+                    num_nosec = report['metrics'][filename]['nosec']
+                    self.add_file(filename, lines_of_code, num_nosec)
+        count_occurrences = self.ignore_lines and self.count_occurrences
+        occurrences = {}
+        occurrence = 1
+        with self.profiler.phase('hits'):
+            for hit in report['results']:
+                hit_hash = self.get_hash(hit, self.ignore_lines)
+                if count_occurrences:
+                    occurrence = occurrences[hit_hash] = occurrences.get(hit_hash, 0) + 1
+                self._add_hit(hit, hit_hash, occurrence, use_filter)
+
+    @property
+    def indexes(self):
+        """
+        Positions of the results by filename, test_id, severity and confidence,
+        plus the sorted filenames for the directory prefix search.
+        They are built on first use and dropped on every change of the report.
+        """
+        if not isinstance(self._result, list):
+            raise ValueError('Indexes are not available on external sort mode')
+        if self._indexes is None:
+            with self.profiler.phase('index'):
+                indexes = {
+                    'filename': {},
+                    'test_id': {},
+                    'severity': {},
+                    'confidence': {},
+                }
+                for (position, result) in enumerate(self._result):
+                    indexes['filename'].setdefault(result['filename'], []).append(position)
+                    indexes['test_id'].setdefault(result.get('test_id'), []).append(position)
+                    indexes['severity'].setdefault(result['issue_severity'], []).append(position)
+                    indexes['confidence'].setdefault(result['issue_confidence'], []).append(position)
+                indexes['filenames'] = sorted(self._metrics)
+                self._indexes = indexes
+        return self._indexes
+
+    def get_filenames(self, path=None):
+        filenames = self.indexes['filenames']
+        if not path:
+            return filenames
+        start = bisect.bisect_left(filenames, path)
+        end = bisect.bisect_left(filenames, path[:-1] + chr(ord(path[-1]) + 1))
+        return filenames[start:end]
+
+    def _get_positions(self, index, values):
+        positions = []
+        for value in values:
+            positions.extend(self.indexes[index].get(value, []))
+        return positions
+
+    def query(self, path=None, test_ids=None, severity=None, confidence=None):
+        """
+        New report with the files under the path prefix and the hits that match all the filters
+        :param path: filename prefix, use a trailing slash for directories
+        :param test_ids: list of test_id to keep
+        :param severity: minimum severity level
+        :param confidence: minimum confidence level
+        """
+        filenames = self.get_filenames(path)
+        candidates = []
+        if path:
+            candidates.append(self._get_positions('filename', filenames))
+        if test_ids:
+            candidates.append(self._get_positions('test_id', test_ids))
+        if severity:
+            candidates.append(self._get_positions('severity', LEVELS[LEVELS.index(severity):]))
+        if confidence:
+            candidates.append(self._get_positions('confidence', LEVELS[LEVELS.index(confidence):]))
+
+        if candidates:
+            candidates.sort(key=len)
+            positions = set(candidates[0])
+            for other in candidates[1:]:
+                positions.intersection_update(other)
+            positions = sorted(positions)
+        else:
+            positions = range(len(self._result))
+
+        generator = BanditReport(self.profiler)
+        generator.ignore_lines = self.ignore_lines
+        for filename in filenames:
+            generator.add_file(filename, self._metrics[filename]['loc'], self._metrics[filename]['nosec'])
+        for position in positions:
+            generator._append_hit(self._result[position])
+        generator.errors = [error for error in self.errors if error['filename'].startswith(path or '')]
+        return generator
 
     @property
     def generated_at(self):
         return datetime.datetime.utcnow().strftime(TS_FORMAT)
 
 
-def mix_report(base, other):
+def mix_report(base, other, profiler=None, memory_budget=None, bloom_filter=None):
+    """
+    With a bloom_filter the hits of base are kept and inserted on the filter, the hits of other
+    are dropped if they are on it, e.g. from base or from a previous run with the same filter.
+    The expected number of new hits dropped by false positives is counted as dedup_false_positives.
+    """
+    generator = BanditReport(profiler, memory_budget, bloom_filter)
+    false_positives = bloom_filter.expected_false_positives if bloom_filter is not None else 0.0
+    generator.add_report(base, use_filter=False)
+    generator.add_report(other)
+    generator.profiler.count_stage('mix', len(base['results']) + len(other['results']), len(generator._result))
+    if bloom_filter is not None:
+        generator.profiler.count('dedup_false_positives', bloom_filter.expected_false_positives - false_positives)
+    return generator.to_dict()
+
+
+def get_bloom_filter(path=None, capacity=None, error_rate=0.01):
+    """Load the filter of a previous run or create a new one"""
+    if path and os.path.isfile(path):
+        with open(path, 'rb') as bloom_file:
+            return BloomFilter.load(bloom_file)
+    return BloomFilter(capacity, error_rate)
+
+
+def get_shards(report, workers):
+    """
+    Split the positions of the results on shards by filename, as the filename is part of the hash
+    the duplicated hits are always on the same shard.
+    """
+    by_file = {}
+    for (position, hit) in enumerate(report['results']):
+        by_file.setdefault(hit['filename'], []).append(position)
+
+    shards = [[] for _ in range(workers)]
+    for filename in sorted(by_file, key=lambda name: len(by_file[name]), reverse=True):
+        shard = min(shards, key=len)
+        shard.extend(by_file[filename])
+    return [shard for shard in shards if shard]
+
+
+_shard_results = None
+
+
+def init_shard_worker(results):
+    """The results are sent once by process, on fork they are not even pickled"""
+    global _shard_results
+    _shard_results = results
+
+
+def fix_shard(positions):
+    """Positions of the kept hits and the hit counts by file, so the hits are not sent back"""
     generator = BanditReport()
-    for report in [base, other]:
-        for filename in report['metrics']:
-            if filename != "_totals":
-                lines_of_code = report['metrics'][filename]['loc']
-                num_nosec = report['metrics'][filename]['nosec']
-                generator.add_file(filename, lines_of_code, num_nosec)
-        for hit in report['results']:
-            generator.add_hit(hit)
+    generator.ignore_lines = False
+    kept = []
+    for position in positions:
+        hit = _shard_results[position]
+        if hit['filename'] not in generator._metrics:
+            generator.add_file(hit['filename'], 0, 0)
+        num_results = len(generator._result)
+        generator.add_hit(hit)
+        if len(generator._result) > num_results:
+            kept.append(position)
+    return kept, generator._metrics
+
+
+def fix(report, profiler=None, workers=1, memory_budget=None):
+    generator = BanditReport(profiler, memory_budget)
+    generator.ignore_lines = False
+    if workers <= 1:
+        generator.add_report(report)
+    else:
+        with generator.profiler.phase('files'):
+            generator.add_report({'metrics': report['metrics'], 'results': []})
+        with generator.profiler.phase('shard'):
+            results = report['results']
+            if not isinstance(results, list):  # The workers need the results by position
+                results = list(results)
+            shards = get_shards({'results': results}, workers)
+        with generator.profiler.phase('hits'):
+            pool = multiprocessing.Pool(min(workers, len(shards) or 1), init_shard_worker, (results,))
+            try:
+                shard_results = pool.map(fix_shard, shards)
+            finally:
+                pool.close()
+                pool.join()
+        with generator.profiler.phase('merge'):
+            kept = []
+            for (positions, metrics) in shard_results:
+                kept.extend(positions)
+                for filename in metrics:
+                    for key in metrics[filename]:
+                        if key not in ["loc", "nosec"]:
+                            generator._metrics[filename][key] += metrics[filename][key]
+            kept.sort()
+            generator._result.extend(results[position] for position in kept)
+            generator._indexes = None
+    generator.profiler.count_stage('fix', len(report['results']), len(generator._result))
     return generator.to_dict()
 
 
-def fix(report):
+def filter_report(report, path=None, test_ids=None, severity=None, confidence=None):
+    """Select the hits of the report, the duplicated ones are kept as --fix is the one that drops them"""
     generator = BanditReport()
     generator.ignore_lines = False
     for filename in report['metrics']:
         if filename != "_totals":
-            lines_of_code = report['metrics'][filename]['loc']
-            num_nosec = report['metrics'][filename]['nosec']
-            generator.add_file(filename, lines_of_code, num_nosec)
+            generator.add_file(filename, report['metrics'][filename]['loc'], report['metrics'][filename]['nosec'])
     for hit in report['results']:
-        generator.add_hit(hit)
-    return generator.to_dict()
+        generator._append_hit(hit)
+    generator.errors = report.get('errors', [])
+    return generator.query(path, test_ids, severity, confidence).to_dict()
+
+
+def write_report(report, stream, indent=None):
+    """
+    Write the report as json.dumps(report, sort_keys=True, indent=indent) does,
+    but the results of the external sort mode are written one by one.
+    """
+    def dumps(value, level):
+        data = json.dumps(value, sort_keys=True, indent=indent, separators=(',', ': '))
+        if indent is None:
+            return data
+        return data.replace('\n', '\n' + ' ' * indent * level)
+
+    if indent is None:
+        (new_line, item_sep, end_sep) = ('', ',', '')
+    else:
+        (new_line, item_sep, end_sep) = ('\n' + ' ' * indent, ',\n' + ' ' * indent, '\n')
+
+    stream.write('{')
+    for (num, key) in enumerate(sorted(report)):
+        stream.write(new_line if not num else item_sep)
+        stream.write('{}: '.format(json.dumps(key)))
+        value = report[key]
+        if not isinstance(value, ExternalSorter):
+            stream.write(dumps(value, 1))
+            continue
+        sub_line = '' if indent is None else '\n' + ' ' * indent * 2
+        stream.write('[')
+        empty = True
+        for item in value:
+            stream.write(sub_line if empty else ',' + sub_line)
+            stream.write(dumps(item, 2))
+            empty = False
+        if not empty and indent is not None:
+            stream.write('\n' + ' ' * indent)
+        stream.write(']')
+    stream.write(end_sep + '}')
 
 
 def main():
@@ -188,39 +453,105 @@ def main():
     parser.add_argument("-M", "--machine", dest="machine", default=False, action="store_true",
                         help="Json format without indent")
     parser.add_argument("-m", "--mixed", dest="mixed", type=str, help="second baseline mixed with")
+    parser.add_argument("-j", "--jobs", dest="jobs", type=int, default=1,
+                        help="Number of processes used by --fix, by default 1")
     parser.add_argument("-o", "--output", dest="output", type=str, help="output file", default=None)
+    parser.add_argument("--memory-budget", dest="memory_budget", type=int, default=None,
+                        help="MB of results kept on memory by --mixed and --fix, the rest are sorted on disk")
+    parser.add_argument("--approximate", dest="approximate", type=float, default=None, metavar="ERROR_RATE",
+                        help="--mixed use a Bloom filter with this false positive rate instead of the exact hashes")
+    parser.add_argument("--bloom-file", dest="bloom_file", type=str, default=None,
+                        help="Bloom filter of --approximate loaded before the mix and saved after it")
+    parser.add_argument("--bloom-capacity", dest="bloom_capacity", type=int, default=None,
+                        help="Hits expected on a new Bloom filter, by default the hits of both reports")
+    parser.add_argument("--path", dest="path", type=str, default=None,
+                        help="Keep only the files with this prefix, use a trailing slash for directories")
+    parser.add_argument("--test-id", dest="test_ids", action="append", default=None,
+                        help="Keep only the hits of this test, could be used several times")
+    parser.add_argument("--severity", dest="severity", choices=LEVELS, default=None,
+                        help="Keep only the hits with this severity or higher")
+    parser.add_argument("--confidence", dest="confidence", choices=LEVELS, default=None,
+                        help="Keep only the hits with this confidence or higher")
+    profiling.add_arguments(parser)
 
     options = vars(parser.parse_args())
+    profiler = profiling.from_options(options)
+    profiler.start()
+    memory_budget = None
+    if options.get('memory_budget'):
+        memory_budget = options.get('memory_budget') * 1024 * 1024
 
     valid_file = options.get('baseline', [""])[0]
     if not os.path.isfile(valid_file):
         parser.exit(-2, "File {} not found".format(valid_file))
-    baseline = json.load(open(valid_file))
+    with profiler.phase('parse'):
+        baseline = json.load(open(valid_file))
 
     valid_file = options.get('mixed')
     if valid_file:
         if not os.path.isfile(valid_file):
             parser.exit(-3, "File {} not found".format(valid_file))
-        mixed_to = json.load(open(valid_file))
-        baseline = mix_report(baseline, mixed_to)
+        with profiler.phase('parse'):
+            mixed_to = json.load(open(valid_file))
+        bloom_filter = None
+        if options.get('approximate'):
+            capacity = options.get('bloom_capacity') or len(baseline['results']) + len(mixed_to['results']) or 1
+            bloom_filter = get_bloom_filter(options.get('bloom_file'), capacity, options.get('approximate'))
+            if len(bloom_filter) >= bloom_filter.capacity:
+                parser.exit(-4, "The Bloom filter {} is full, {} hits of {}, create a new one with a bigger "
+                                "--bloom-capacity".format(options.get('bloom_file'), len(bloom_filter),
+                                                          bloom_filter.capacity))
+            if bloom_filter.error_rate != options.get('approximate') or (
+                    options.get('bloom_capacity') and bloom_filter.capacity != options.get('bloom_capacity')):
+                sys.stderr.write("The Bloom filter {} keeps its false positive rate {} and capacity {}\n".format(
+                    options.get('bloom_file'), bloom_filter.error_rate, bloom_filter.capacity))
+            false_positives = bloom_filter.expected_false_positives
+        with profiler.phase('mix'):
+            baseline = mix_report(baseline, mixed_to, profiler, memory_budget, bloom_filter)
+        if bloom_filter is not None:
+            message = "Approximate dedup: {} hits on filter, false positive rate {:.6f}, {:.2f} expected lost hits\n"
+            lost = bloom_filter.expected_false_positives - false_positives
+            sys.stderr.write(message.format(len(bloom_filter), bloom_filter.false_positive_rate, lost))
+            if len(bloom_filter) > bloom_filter.capacity:
+                sys.stderr.write("The Bloom filter is over its capacity of {} hits, the false positive rate is "
+                                 "above {}, create a new one with a bigger --bloom-capacity\n".format(
+                                     bloom_filter.capacity, bloom_filter.error_rate))
+            if options.get('bloom_file'):
+                with open(options.get('bloom_file'), 'wb') as bloom_file:
+                    bloom_filter.dump(bloom_file)
 
     if options.get('zip'):
-        baseline = zip_report(baseline)
+        with profiler.phase('zip'):
+            baseline = zip_report(baseline)
 
     if options.get('fix'):
-        baseline = fix(baseline)
+        with profiler.phase('fix'):
+            baseline = fix(baseline, profiler, options.get('jobs'), memory_budget)
 
-    indent = None if options.get('machine') else 2
-    json_str = json.dumps(baseline, sort_keys=True, indent=indent, separators=(',', ': '))
+    filters = [options.get(key) for key in ['path', 'test_ids', 'severity', 'confidence']]
+    if any(filters):
+        with profiler.phase('filter'):
+            baseline = filter_report(baseline, *filters)
 
+    indent = None if options.get('machine') else 2
     stdout = sys.stdout
     if options.get('output'):
         stdout = open(options.get('output'), 'w')
 
-    stdout.write(json_str)
+    if isinstance(baseline['results'], list):
+        with profiler.phase('serialise'):
+            json_str = json.dumps(baseline, sort_keys=True, indent=indent, separators=(',', ': '))
+        with profiler.phase('write'):
+            stdout.write(json_str)
+    else:
+        with profiler.phase('write'):
+            write_report(baseline, stdout, indent)
     if options.get('output'):
         stdout.close()
 
+    profiler.stop()
+    profiling.report_stats(profiler, options)
+
 
 if __name__ == '__main__':  # pragma: no cover
     main()
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright 2019 Victor Torre
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import random
+
+from bandit_tools.baseline_tools import BASE_DICT
+
+GENERATED_AT = "2019-03-19T09:18:54Z"
+MORE_INFO = "https://bandit.readthedocs.io/en/latest/plugins/{}_{}.html"
+FILLER = [
+    "import os",
+    "value = compute(data)",
+    "logger.debug('processing %s', name)",
+    "result.append(item)",
+    "return response",
+]
+TESTS = [
+    ("B101", "assert_used", "LOW", "HIGH",
+     "Use of assert detected. The enclosed code will be removed when compiling to optimised byte code.",
+     "assert {name} is not None"),
+    ("B105", "hardcoded_password_string", "LOW", "MEDIUM",
+     "Possible hardcoded password: '{name}'",
+     "password = '{name}'"),
+    ("B108", "hardcoded_tmp_directory", "MEDIUM", "MEDIUM",
+     "Probable insecure usage of temp file/directory.",
+     "open('/tmp/{name}', 'w')"),
+    ("B303", "blacklist", "MEDIUM", "HIGH",
+     "Use of insecure MD2, MD4, MD5, or SHA1 hash function.",
+     "hashlib.md5({name})"),
+    ("B307", "blacklist", "MEDIUM", "HIGH",
+     "Use of possibly insecure function - consider using safer ast.literal_eval.",
+     "eval({name})"),
+    ("B404", "blacklist", "LOW", "HIGH",
+     "Consider possible security implications associated with subprocess module.",
+     "import subprocess as {name}"),
+    ("B602", "subprocess_popen_with_shell_equals_true", "HIGH", "HIGH",
+     "subprocess call with shell=True identified, security issue.",
+     "subprocess.Popen({name}, shell=True)"),
+    ("B608", "hardcoded_sql_expressions", "MEDIUM", "LOW",
+     "Possible SQL injection vector through string-based query construction.",
+     "cursor.execute('SELECT * FROM %s' % {name})"),
+    ("B703", "django_mark_safe", "MEDIUM", "HIGH",
+     "Potential XSS on mark_safe function.",
+     "mark_safe({name})"),
+]
+
+
+def get_filename(num_file, files_per_dir=20, prefix='src'):
+    return '{}/pkg{}/module{}.py'.format(prefix, num_file // files_per_dir, num_file)
+
+
+def get_code(line_number, statement, snippet_lines):
+    first_line = line_number - snippet_lines // 2
+    lines = []
+    for num in range(first_line, first_line + snippet_lines):
+        if num == line_number:
+            lines.append("{} {}".format(num, statement))
+        else:
+            lines.append("{} {}".format(num, FILLER[(num - first_line) % len(FILLER)]))
+    return '\n'.join(lines) + '\n'
+
+
+def get_line_number(rnd, loc, snippet_lines):
+    return rnd.randint(snippet_lines // 2 + 1, loc)
+
+
+def new_hit(rnd, filename, loc, num_hit, snippet_lines):
+    test_id, test_name, severity, confidence, text, statement = rnd.choice(TESTS)
+    name = 'var_{}'.format(num_hit)
+    line_number = get_line_number(rnd, loc, snippet_lines)
+    return {
+        "code": get_code(line_number, statement.format(name=name), snippet_lines),
+        "filename": filename,
+        "issue_confidence": confidence,
+        "issue_severity": severity,
+        "issue_text": text.format(name=name),
+        "line_number": line_number,
+        "line_range": [line_number],
+        "more_info": MORE_INFO.format(test_id.lower(), test_name),
+        "test_id": test_id,
+        "test_name": test_name,
+    }
+
+
+def duplicate_hit(rnd, hit, loc, snippet_lines):
+    """Same risky code on other line, so BanditReport.get_hash is the same"""
+    statement = hit["code"].split('\n')[snippet_lines // 2].split(' ', 1)[1]
+    line_number = get_line_number(rnd, loc, snippet_lines)
+    duplicated = hit.copy()
+    duplicated["code"] = get_code(line_number, statement, snippet_lines)
+    duplicated["line_number"] = line_number
+    duplicated["line_range"] = [line_number]
+    return duplicated
+
+
+def generate_report(files=100, hits_per_file=5, duplicate_ratio=0.1, snippet_lines=3, seed=0,
+                    files_per_dir=20, prefix='src'):
+    """
+    Build a synthetic Bandit JSON report.
+    The same arguments always return the same report.
+    :param files: number of files on the metrics
+    :param hits_per_file: number of results for each file
+    :param duplicate_ratio: probability of a hit to be the same risky code of a previous hit on other line
+    :param snippet_lines: number of code lines for each hit
+    :param seed: seed of the random generator
+    """
+    rnd = random.Random(seed)
+    metrics = {"_totals": BASE_DICT.copy()}
+    results = []
+    num_hit = 0
+    for num_file in range(files):
+        filename = get_filename(num_file, files_per_dir, prefix)
+        file_data = BASE_DICT.copy()
+        file_data["loc"] = rnd.randint(hits_per_file + snippet_lines, 2000)
+        file_data["nosec"] = rnd.randint(0, 3)
+        file_hits = []
+        for _ in range(hits_per_file):
+            if file_hits and rnd.random() < duplicate_ratio:
+                hit = duplicate_hit(rnd, rnd.choice(file_hits), file_data["loc"], snippet_lines)
+            else:
+                hit = new_hit(rnd, filename, file_data["loc"], num_hit, snippet_lines)
+            num_hit += 1
+            file_data["CONFIDENCE.{}".format(hit["issue_confidence"])] += 1
+            file_data["SEVERITY.{}".format(hit["issue_severity"])] += 1
+            file_hits.append(hit)
+        file_hits.sort(key=lambda item: item["line_number"])
+        results.extend(file_hits)
+        metrics[filename] = file_data
+        for key in file_data:
+            metrics["_totals"][key] += file_data[key]
+
+    return {
+        "errors": [],
+        "generated_at": GENERATED_AT,
+        "metrics": metrics,
+        "results": results,
+    }
@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright 2019 Victor Torre
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import argparse
+import collections
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+
+from bandit_tools.baseline_tools import BanditReport
+from bandit_tools.baseline_tools import fix
+from bandit_tools.baseline_tools import mix_report
+from bandit_tools.baseline_tools import zip_report
+from bandit_tools.benchmark.generator import generate_report
+from bandit_tools.bloom import BloomFilter
+from bandit_tools.custom_report import get_environment
+from bandit_tools.custom_report import get_loader_paths
+from bandit_tools.custom_report import write_lazy
+from bandit_tools.history import HistoryStore
+from bandit_tools.pipeline import run_pipeline
+from bandit_tools.profiling import NULL_PROFILER
+from bandit_tools.profiling import timer
+from bandit_tools.render_cache import RenderCache
+
+BENCHMARKS = collections.OrderedDict()
+
+
+def benchmark(name):
+    """Register a benchmark, the decorated function receives the params and returns the callable to time"""
+    def decorator(funct):
+        BENCHMARKS[name] = funct
+        return funct
+    return decorator
+
+
+def get_other_report(report, params):
+    """Second report for the mix, it shares the files and half of the hits with the first one"""
+    other_params = dict(params, seed=params['seed'] + 1)
+    other = generate_report(**other_params)
+    other['results'] = other['results'] + report['results'][::2]
+    return other
+
+
+@benchmark('get_hash')
+def bench_get_hash(report, params):
+    results = report['results']
+
+    def run():
+        for hit in results:
+            BanditReport.get_hash(hit)
+    return run
+
+
+@benchmark('mix_report')
+def bench_mix_report(report, params):
+    other = get_other_report(report, params)
+    return lambda: mix_report(report, other)
+
+
+@benchmark('mix_report_lossy')
+def bench_mix_report_lossy(report, params):
+    """mix_report dropping the repeated hits of a file, as it was before the occurrence count"""
+    other = get_other_report(report, params)
+
+    def run():
+        generator = BanditReport()
+        generator.count_occurrences = False
+        generator.add_report(report)
+        generator.add_report(other)
+        return generator.to_dict()
+    return run
+
+
+@benchmark('mix_report_approximate')
+def bench_mix_report_approximate(report, params):
+    """mix_report with a Bloom filter of 0.1% false positives"""
+    other = get_other_report(report, params)
+    capacity = len(report['results']) + len(other['results'])
+    return lambda: mix_report(report, other, bloom_filter=BloomFilter(capacity, 0.001))
+
+
+def get_fingerprints(report, params):
+    """Keys of the mix as BanditReport stores them"""
+    hits = report['results'] + get_other_report(report, params)['results']
+    return [BanditReport.get_hash(hit) for hit in hits]
+
+
+@benchmark('dedup_exact')
+def bench_dedup_exact(report, params):
+    """Bytes per million hits of the exact hashes dict"""
+    fingerprints = get_fingerprints(report, params)
+
+    def run():
+        hashes = {}
+        for fingerprint in fingerprints:
+            hashes[fingerprint] = 1
+        size = sys.getsizeof(hashes) + sum(sys.getsizeof(fingerprint) for fingerprint in hashes)
+        return size * 1000000 // len(fingerprints)
+    return run
+
+
+@benchmark('dedup_approximate')
+def bench_dedup_approximate(report, params):
+    """Bytes per million hits of a Bloom filter with 0.1% false positives"""
+    fingerprints = get_fingerprints(report, params)
+
+    def run():
+        bloom_filter = BloomFilter(len(fingerprints), 0.001)
+        for fingerprint in fingerprints:
+            bloom_filter.add('{}:1'.format(fingerprint))
+        return bloom_filter.size * 1000000 // len(fingerprints)
+    return run
+
+
+@benchmark('fix')
+def bench_fix(report, params):
+    return lambda: fix(report)
+
+
+@benchmark('zip_report')
+def bench_zip_report(report, params):
+    return lambda: zip_report(report)
+
+
+@benchmark('render')
+def bench_render(report, params):
+    template = get_environment(get_loader_paths()).get_template('my_report.html')
+    return lambda: len(template.render(base_uri='', **report).encode('utf8'))
+
+
+@benchmark('render_lazy')
+def bench_render_lazy(report, params):
+    """The size is the HTML shell plus all the chunks"""
+    template = get_environment(get_loader_paths()).get_template('lazy_report.html')
+
+    def run():
+        output_dir = tempfile.mkdtemp(prefix='bandit_tools_')
+        try:
+            output = os.path.join(output_dir, 'report.html')
+            write_lazy(report, template, {}, NULL_PROFILER, output)
+            size = 0
+            for (path, _, files) in os.walk(output_dir):
+                size += sum(os.path.getsize(os.path.join(path, name)) for name in files)
+            return size
+        finally:
+            shutil.rmtree(output_dir)
+    return run
+
+
+@benchmark('render_cached')
+def bench_render_cached(report, params):
+    env = get_environment(get_loader_paths())
+    template = env.get_template('my_report.html')
+    issue_cache = RenderCache(env.get_template('issue.html'))
+    template.render(base_uri='', issue_cache=issue_cache, **report)
+    return lambda: template.render(base_uri='', issue_cache=issue_cache, **report)
+
+
+def round_trip(report):
+    return json.loads(json.dumps(report, sort_keys=True, indent=2, separators=(',', ': ')))
+
+
+@benchmark('pipeline')
+def bench_pipeline(report, params):
+    other = get_other_report(report, params)
+    template = get_environment(get_loader_paths()).get_template('my_report.html')
+
+    def run():
+        result = run_pipeline([report, other], fix_hits=True, zip_files=True)
+        json.dumps(result, sort_keys=True, indent=2, separators=(',', ': '))
+        template.render(base_uri='', **result)
+    return run
+
+
+@benchmark('pipeline_chained')
+def bench_pipeline_chained(report, params):
+    """Same steps as the pipeline, but with the JSON round trip of running each CLI"""
+    other = get_other_report(report, params)
+    template = get_environment(get_loader_paths()).get_template('my_report.html')
+
+    def run():
+        result = round_trip(mix_report(round_trip(report), round_trip(other)))
+        result = round_trip(fix(zip_report(result)))
+        template.render(base_uri='', **result)
+    return run
+
+
+@benchmark('history_ingest')
+def bench_history_ingest(report, params):
+    def run():
+        store = HistoryStore()
+        store.ingest(report)
+        store.close()
+    return run
+
+
+@benchmark('history_queries')
+def bench_history_queries(report, params):
+    """trend, diff and first seen over 100 runs of the report"""
+    store = HistoryStore()
+    for num in range(100):
+        store.ingest(dict(report, generated_at='run {:03d}'.format(num)))
+    fingerprint = BanditReport.get_hash(report['results'][-1])
+
+    def run():
+        store.trend('HIGH')
+        store.diff(1, 100)
+        store.first_seen(fingerprint)
+    return run
+
+
+def time_it(funct, repeat):
+    """If the benchmark returns a number it is stored as the output size"""
+    runs = []
+    size = None
+    for _ in range(repeat):
+        started_at = timer()
+        output = funct()
+        runs.append(timer() - started_at)
+        if isinstance(output, int):
+            size = output
+    data = {
+        "best": min(runs),
+        "mean": sum(runs) / len(runs),
+        "runs": runs,
+    }
+    if size is not None:
+        data["size"] = size
+    return data
+
+
+def speedup_curve(report, max_workers, repeat):
+    """Time of fix from 1 to max_workers processes"""
+    curve = collections.OrderedDict()
+    for workers in range(1, max_workers + 1):
+        curve[workers] = time_it(lambda: fix(report, workers=workers), repeat)
+        curve[workers]["speedup"] = curve[1]["best"] / curve[workers]["best"]
+    return curve
+
+
+def run_benchmarks(params, names=None, repeat=3, max_workers=0):
+    report = generate_report(**params)
+    results = collections.OrderedDict()
+    for name in names or BENCHMARKS:
+        results[name] = time_it(BENCHMARKS[name](report, params), repeat)
+    data = {
+        "python": platform.python_version(),
+        "params": params,
+        "hits": len(report['results']),
+        "results": results,
+    }
+    if max_workers:
+        data["fix_speedup"] = speedup_curve(report, max_workers, repeat)
+    return data
+
+
+def compare(current, previous, stream):
+    stream.write("{:<24} {:>12} {:>12} {:>8}\n".format("benchmark", "previous", "current", "ratio"))
+    for name, data in current["results"].items():
+        if name not in previous.get("results", {}):
+            continue
+        old = previous["results"][name]["best"]
+        ratio = data["best"] / old if old else float('inf')
+        stream.write("{:<24} {:>12.6f} {:>12.6f} {:>8.2f}\n".format(name, old, data["best"], ratio))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks of bandit_tools over synthetic reports')
+
+    parser.add_argument("-b", "--benchmark", dest="benchmarks", action="append", choices=list(BENCHMARKS),
+                        help="benchmark to run, by default all")
+    parser.add_argument("--files", type=int, default=1000, help="number of files on the report")
+    parser.add_argument("--hits", dest="hits_per_file", type=int, default=10, help="hits per file")
+    parser.add_argument("--duplicates", dest="duplicate_ratio", type=float, default=0.1,
+                        help="ratio of hits with the same risky code on other line")
+    parser.add_argument("--snippet", dest="snippet_lines", type=int, default=3, help="code lines per hit")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the report generator")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="times each benchmark is run")
+    parser.add_argument("-w", "--workers", type=int, default=0,
+                        help="measure the speedup of fix from 1 to this number of processes")
+    parser.add_argument("-c", "--compare", type=str, default=None, help="previous results to compare with")
+    parser.add_argument("-o", "--output", type=str, default=None, help="output file for the JSON results")
+
+    options = vars(parser.parse_args())
+    params = {key: options[key] for key in ['files', 'hits_per_file', 'duplicate_ratio', 'snippet_lines', 'seed']}
+    results = run_benchmarks(params, options.get('benchmarks'), options.get('repeat'), options.get('workers'))
+
+    for name, data in results["results"].items():
+        size = " size {} bytes".format(data["size"]) if "size" in data else ""
+        sys.stdout.write("{:<24} best {:.6f}s mean {:.6f}s{}\n".format(name, data["best"], data["mean"], size))
+    for workers, data in results.get("fix_speedup", {}).items():
+        sys.stdout.write("fix with {:<3} workers    best {:.6f}s speedup {:.2f}\n".format(
+            workers, data["best"], data["speedup"]))
+
+    if options.get('compare'):
+        compare(results, json.load(open(options.get('compare'))), sys.stdout)
+
+    if options.get('output'):
+        with open(options.get('output'), 'w') as output:
+            json.dump(results, output, sort_keys=True, indent=2, separators=(',', ': '))
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright 2019 Victor Torre
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+
+import hashlib
+import math
+import struct
+
+HEADER = struct.Struct('<4sQQQQdd')
+MAGIC = b'BTBF'
+
+
+class BloomFilter(object):
+    """
+    Set of keys with false positives, sized for a number of keys and a false positive rate.
+    It uses about 1.2 bytes per key for a rate of 0.01, a hex md5 on a dict needs more than 100.
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        """
+        :param capacity: expected number of keys, over it the false positive rate grows
+        :param error_rate: false positive rate with capacity keys
+        """
+        if capacity < 1:
+            raise ValueError('The capacity must be positive')
+        if not 0 < error_rate < 1:
+            raise ValueError('The error rate must be between 0 and 1')
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.num_hashes = max(1, int(round(float(self.num_bits) / capacity * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+        self.expected_false_positives = 0.0
+
+    def _positions(self, key):
+        """Double hashing, the k positions are derived from the two halves of the md5"""
+        (first, second) = struct.unpack('<QQ', hashlib.md5(key.encode('utf8')).digest())
+        return [(first + num * second) % self.num_bits for num in range(self.num_hashes)]
+
+    def __contains__(self, key):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    def __len__(self):
+        return self.count
+
+    def add(self, key):
+        """Add the key, returns False if it was already added or it is a false positive"""
+        found = True
+        for pos in self._positions(key):
+            mask = 1 << (pos & 7)
+            if not self.bits[pos >> 3] & mask:
+                self.bits[pos >> 3] |= mask
+                found = False
+        if not found:
+            self.expected_false_positives += self.false_positive_rate
+            self.count += 1
+        return not found
+
+    @property
+    def false_positive_rate(self):
+        """Estimated probability that a new key is taken as added"""
+        return (1.0 - math.exp(-float(self.num_hashes) * self.count / self.num_bits)) ** self.num_hashes
+
+    @property
+    def size(self):
+        return len(self.bits)
+
+    def dump(self, stream):
+        stream.write(HEADER.pack(MAGIC, self.capacity, self.num_bits, self.num_hashes, self.count,
+                                 self.error_rate, self.expected_false_positives))
+        stream.write(bytes(self.bits))
+
+    @classmethod
+    def load(cls, stream):
+        header = stream.read(HEADER.size)
+        if len(header) != HEADER.size or header[:4] != MAGIC:
+            raise ValueError('Not a Bloom filter file')
+        (_, capacity, num_bits, num_hashes, count, error_rate, false_positives) = HEADER.unpack(header)
+        bloom = cls.__new__(cls)
+        bloom.capacity = capacity
+        bloom.error_rate = error_rate
+        bloom.num_bits = num_bits
+        bloom.num_hashes = num_hashes
+        bloom.count = count
+        bloom.expected_false_positives = false_positives
+        bloom.bits = bytearray(stream.read((num_bits + 7) // 8))
+        if len(bloom.bits) != (num_bits + 7) // 8:
+            raise ValueError('Truncated Bloom filter file')
+        return bloom
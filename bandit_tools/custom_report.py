@@ -16,18 +16,25 @@ limitations under the License.
 """
 
 import argparse
+import base64
+import glob
 import sys
 import json
 import os
 import re
+import zlib
 
 from jinja2 import Environment, FileSystemLoader, select_autoescape
 
+from bandit_tools import profiling
+from bandit_tools.render_cache import RenderCache
+
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 CODE_LINE = re.compile(r'(\d+) *(\w+|#|\'|\")')
 VALID_BASE_URI = re.compile(r'^((https?|file)://|/)')
 
+CHUNK_FILE = 'results-{:06d}.js'
 BANDIT_URLS = {}  # To fix bug https://github.com/PyCQA/bandit/issues/506
 
 
@@ -61,40 +68,53 @@ def show_code(value, num_space=4):
     return '\n'.join(lines)
 
 
-def main():
-    parser = argparse.ArgumentParser(
-        description='Tool for Bandit Custom HTML report\n'
-                    'This tools allows to create a customize HTML Bandit from json one'
-                    ' using Jinja2 to compose the HTML'
+def get_loader_paths(template_path=None):
+    loader_fs = []
+
+    default_path = os.path.join(BASE_DIR, 'templates')
+    if default_path and os.path.isdir(default_path):
+        loader_fs.append(default_path)
+
+    if template_path and os.path.isdir(template_path):
+        loader_fs.append(template_path)
+    return loader_fs
+
+
+def get_environment(loader_fs):
+    env = Environment(
+        loader=FileSystemLoader(loader_fs),
+        autoescape=select_autoescape(['html', 'jinja2', 'j2']),
     )
+    env.filters['get_bandit_url'] = get_bandit_url
+    env.filters['show_code'] = show_code
+    return env
 
-    parser.add_argument("report", type=str, nargs=1,
-                        help="the report on JSON format")
-    parser.add_argument("-o", "--output", type=str, help="output file", default=None)
+
+def add_arguments(parser):
     parser.add_argument("-p", "--path", dest="template_path", type=str, default=None,
                         help="The template path where files will be storage")
     parser.add_argument("-t", "--template", dest="template", type=str, default='my_report.html',
                         help="Template to render by default my_report.html")
     parser.add_argument("-b", "--base", dest="base_uri", type=str, default='',
                         help="The URI for add on the base html tag")
+    parser.add_argument("-c", "--cache", dest="cache", type=str, default=None,
+                        help="Cache file of rendered issues, only changed issues will be rendered")
+    parser.add_argument("--cache-size", dest="cache_size", type=int, default=50000,
+                        help="Max number of issues on the cache, by default 50000")
 
-    options = vars(parser.parse_args())
-
-    report_file = options.get('report')[0]
-    if not os.path.isfile(report_file):
-        parser.exit(-1, "File {} not found".format(report_file))
-
-    report_json = json.load(open(report_file))
 
-    loader_fs = []
+def get_base_uri(base_uri):
+    if not base_uri or not VALID_BASE_URI.match(base_uri):
+        return ''
+    if not base_uri.endswith('/'):
+        base_uri += '/'
+    if base_uri.startswith('/'):
+        base_uri = 'file://' + base_uri
+    return base_uri
 
-    default_path = os.path.join(BASE_DIR, 'templates')
-    if default_path and os.path.isdir(default_path):
-        loader_fs.append(default_path)
 
-    template_path = options.get('template_path')
-    if template_path and os.path.isdir(template_path):
-        loader_fs.append(template_path)
+def get_template(parser, options):
+    loader_fs = get_loader_paths(options.get('template_path'))
 
     template_file = options.get('template')
     if template_file:
@@ -107,34 +127,150 @@ def main():
         if not valid_file:
             parser.exit(-2, "File {} not found".format(template_file))
 
-    env = Environment(
-        loader=FileSystemLoader(loader_fs),
-        autoescape=select_autoescape(['html', 'jinja2', 'j2']),
+    env = get_environment(loader_fs)
+    return env.get_template(template_file)
+
+
+def write_html(report_json, template, options, profiler, stream, issue_cache=None):
+    """
+    Render the report with the options of add_arguments and write it on the stream
+    :param issue_cache: RenderCache kept by the caller, then the --cache file is not used
+    """
+    cache_file = None
+    if issue_cache is None and options.get('cache'):
+        cache_file = options.get('cache')
+        issue_template = template.environment.get_template('issue.html')
+        issue_cache = RenderCache(issue_template, max_entries=options.get('cache_size'))
+        with profiler.phase('cache_load'):
+            issue_cache.load(cache_file)
+
+    base_uri = get_base_uri(options.get('base_uri'))
+    with profiler.phase('render'):
+        report = template.render(base_uri=base_uri, issue_cache=issue_cache, **report_json)
+    if sys.version_info.major == 2:  # pragma: no cover
+        report = report.encode('utf8')
+    with profiler.phase('write'):
+        stream.write(report)
+
+    if cache_file:
+        with profiler.phase('cache_save'):
+            issue_cache.save(cache_file)
+    if issue_cache:
+        profiler.count('cache_hits', issue_cache.hits)
+        profiler.count('cache_misses', issue_cache.misses)
+
+
+def write_chunk(path, index, results):
+    """Write the results as gzip JSON on base64 inside a script, so it could be loaded from file://"""
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 31)
+    data = json.dumps(results, sort_keys=True, separators=(',', ':')).encode('utf8')
+    data = compressor.compress(data) + compressor.flush()
+    with open(path, 'w') as chunk_file:
+        chunk_file.write('banditChunk({}, "{}");\n'.format(index, base64.b64encode(data).decode('ascii')))
+
+
+def write_lazy(report_json, template, options, profiler, output):
+    """
+    Write the HTML shell on output and the results on chunks of chunk_size issues
+    on the <output>_chunks directory, the shell loads and renders them on scroll.
+    """
+    chunk_size = options.get('chunk_size') or 500
+    chunk_dir = os.path.splitext(output)[0] + '_chunks'
+    if not os.path.isdir(chunk_dir):
+        os.makedirs(chunk_dir)
+    for old_chunk in glob.glob(os.path.join(chunk_dir, 'results-*.js')):
+        os.remove(old_chunk)
+
+    bandit_urls = {}
+    num_issues = 0
+    chunk = []
+    with profiler.phase('chunks'):
+        for issue in report_json['results']:
+            if issue.get('test_id') not in bandit_urls:
+                bandit_urls[issue.get('test_id')] = get_bandit_url(issue.get('test_id'))
+            chunk.append(issue)
+            num_issues += 1
+            if len(chunk) == chunk_size:
+                index = num_issues // chunk_size - 1
+                write_chunk(os.path.join(chunk_dir, CHUNK_FILE.format(index)), index, chunk)
+                chunk = []
+        num_chunks = (num_issues + chunk_size - 1) // chunk_size
+        if chunk:
+            write_chunk(os.path.join(chunk_dir, CHUNK_FILE.format(num_chunks - 1)), num_chunks - 1, chunk)
+
+    context = dict(report_json)
+    context['results'] = []
+    with profiler.phase('render'):
+        report = template.render(
+            base_uri=get_base_uri(options.get('base_uri')),
+            chunk_dir=os.path.basename(chunk_dir),
+            chunk_size=chunk_size,
+            num_chunks=num_chunks,
+            num_issues=num_issues,
+            bandit_urls=bandit_urls,
+            **context
+        )
+    if sys.version_info.major == 2:  # pragma: no cover
+        report = report.encode('utf8')
+    with profiler.phase('write'):
+        with open(output, 'w') as html:
+            html.write(report)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Tool for Bandit Custom HTML report\n'
+                    'This tools allows to create a customize HTML Bandit from json one'
+                    ' using Jinja2 to compose the HTML'
     )
-    env.filters['get_bandit_url'] = get_bandit_url
-    env.filters['show_code'] = show_code
-    template = env.get_template(template_file)
 
-    base_uri = options.get('base_uri')
-    if not VALID_BASE_URI.match(base_uri):
-        base_uri = ''
-    else:
-        if not base_uri.endswith('/'):
-            base_uri += '/'
-        if base_uri.startswith('/'):
-            base_uri = 'file://' + base_uri
+    parser.add_argument("report", type=str, nargs=1,
+                        help="the report on JSON format")
+    parser.add_argument("-o", "--output", type=str, help="output file", default=None)
+    parser.add_argument("-l", "--lazy", dest="lazy", default=False, action="store_true",
+                        help="Write the issues as compressed JSON chunks loaded by the browser on scroll,"
+                             " needs --output")
+    parser.add_argument("--chunk-size", dest="chunk_size", type=int, default=500,
+                        help="Issues by chunk on --lazy mode, by default 500")
+    add_arguments(parser)
+    profiling.add_arguments(parser)
+
+    options = vars(parser.parse_args())
+    profiler = profiling.from_options(options)
+    profiler.start()
+
+    report_file = options.get('report')[0]
+    if not os.path.isfile(report_file):
+        parser.exit(-1, "File {} not found".format(report_file))
+
+    with profiler.phase('parse'):
+        report_json = json.load(open(report_file))
+    profiler.count('issues', len(report_json.get('results', [])))
+
+    if options.get('lazy'):
+        if not options.get('output'):
+            parser.exit(-3, "The lazy mode needs an output file")
+        if options.get('template') == 'my_report.html':
+            options['template'] = 'lazy_report.html'
+        template = get_template(parser, options)
+        write_lazy(report_json, template, options, profiler, options.get('output'))
+        profiler.stop()
+        profiling.report_stats(profiler, options)
+        return
+
+    template = get_template(parser, options)
 
     stdout = sys.stdout
     if options.get('output'):
         stdout = open(options.get('output'), 'w')
 
-    report = template.render(base_uri=base_uri, **report_json)
-    if sys.version_info.major == 2:  # pragma: no cover
-        report = report.encode('utf8')
-    stdout.write(report)
+    write_html(report_json, template, options, profiler, stdout)
     if options.get('output'):
         stdout.close()
 
+    profiler.stop()
+    profiling.report_stats(profiler, options)
+
 
 if __name__ == '__main__':  # pragma: no cover
     main()
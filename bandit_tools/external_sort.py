@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright 2019 Victor Torre
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import heapq
+import json
+import os
+import shutil
+import tempfile
+
+
+class ExternalSorter(object):
+    """
+    List like container of results sorted by filename on iteration.
+    The results with the same filename keep the insertion order, as sorted() does.
+    When the buffer is bigger than the memory budget, it is sorted and written
+    as a run on a temporary file, the iteration merges all the runs.
+    At most max_open_runs files are open at once, with more runs they are first
+    merged by groups on bigger runs.
+    """
+
+    def __init__(self, memory_budget, key='filename', max_open_runs=64):
+        self.memory_budget = memory_budget
+        self.key = key
+        self.max_open_runs = max(3, max_open_runs)
+        self._buffer = []
+        self._buffer_size = 0
+        self._runs = []
+        self._num_files = 0
+        self._count = 0
+        self._tmp_dir = None
+
+    def __len__(self):
+        return self._count
+
+    def append(self, item):
+        line = json.dumps(item, sort_keys=True)
+        self._buffer.append((item[self.key], self._count, line))
+        self._buffer_size += len(line)
+        self._count += 1
+        if self._buffer_size >= self.memory_budget:
+            self._spill()
+
+    def extend(self, items):
+        for item in items:
+            self.append(item)
+
+    def _write_run(self, items):
+        if self._tmp_dir is None:
+            self._tmp_dir = tempfile.mkdtemp(prefix='bandit_tools_')
+        path = os.path.join(self._tmp_dir, 'run_{}.jsonl'.format(self._num_files))
+        self._num_files += 1
+        with open(path, 'w') as run_file:
+            for (key, position, line) in items:
+                run_file.write('{}\t{}\t{}\n'.format(json.dumps(key), position, line))
+        return path
+
+    def _spill(self):
+        self._buffer.sort()
+        self._runs.append(self._write_run(self._buffer))
+        self._buffer = []
+        self._buffer_size = 0
+
+    def _reduce_runs(self):
+        """Merge the runs by groups until they could be merged with less than max_open_runs files"""
+        group_size = self.max_open_runs - 1  # Plus the file of the merged run
+        while len(self._runs) >= self.max_open_runs:
+            runs = []
+            for start in range(0, len(self._runs), group_size):
+                group = self._runs[start:start + group_size]
+                runs.append(self._write_run(heapq.merge(*[ExternalSorter._read_run(path) for path in group])))
+                for path in group:
+                    os.remove(path)
+            self._runs = runs
+
+    @staticmethod
+    def _read_run(path):
+        with open(path) as run_file:
+            for line in run_file:
+                (key, position, line) = line.rstrip('\n').split('\t', 2)
+                yield (json.loads(key), int(position), line)
+
+    def __iter__(self):
+        self._buffer.sort()
+        self._reduce_runs()
+        runs = [ExternalSorter._read_run(path) for path in self._runs]
+        runs.append(iter(self._buffer))
+        for (_, _, line) in heapq.merge(*runs):
+            yield json.loads(line)
+
+    @property
+    def num_runs(self):
+        return len(self._runs)
+
+    def close(self):
+        if self._tmp_dir is not None:
+            shutil.rmtree(self._tmp_dir, ignore_errors=True)
+            self._tmp_dir = None
+        self._runs = []
+
+    def __del__(self):
+        self.close()
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright 2019 Victor Torre
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import json
+import os
+
+from bandit_tools import profiling
+from bandit_tools.baseline_tools import BanditReport
+from bandit_tools.baseline_tools import write_report
+from bandit_tools.custom_report import get_bandit_url
+from bandit_tools.custom_report import get_environment
+from bandit_tools.custom_report import get_loader_paths
+from bandit_tools.custom_report import write_html
+
+BASELINE_ENV = 'BANDIT_TOOLS_BASELINE'
+HTML_ENV = 'BANDIT_TOOLS_HTML'
+TEMPLATE_PATH_ENV = 'BANDIT_TOOLS_TEMPLATE_PATH'
+TEMPLATE_ENV = 'BANDIT_TOOLS_TEMPLATE'
+BASE_URI_ENV = 'BANDIT_TOOLS_BASE_URI'
+
+
+def issue_as_dict(issue, lines=-1):
+    try:
+        hit = issue.as_dict(max_lines=lines)
+    except TypeError:  # pragma: no cover
+        hit = issue.as_dict(with_code=True)
+    hit["more_info"] = get_bandit_url(hit["test_id"])
+    return hit
+
+
+def get_report(manager, sev_level, conf_level, lines=-1):
+    """Report dict from the Bandit manager, as the Bandit json formatter does"""
+    errors = [{"filename": filename, "reason": reason} for (filename, reason) in manager.get_skipped()]
+    metrics = manager.metrics.data
+    issues = manager.get_issue_list(sev_level=sev_level, conf_level=conf_level)
+    return {
+        "errors": errors,
+        "metrics": metrics,
+        "results": [issue_as_dict(issue, lines) for issue in issues],
+    }
+
+
+def report(manager, fileobj, sev_level, conf_level, lines=-1):
+    """
+    Bandit formatter, registered as "bandit_tools" on the bandit.formatters entry point.
+    The results are mixed with the baseline of the BANDIT_TOOLS_BASELINE environment variable if any,
+    and the HTML report is written on BANDIT_TOOLS_HTML if any.
+    :param manager: the bandit manager object
+    :param fileobj: The output file object, which may be sys.stdout
+    :param sev_level: Filtering severity level
+    :param conf_level: Filtering confidence level
+    :param lines: Number of lines to report, -1 for all
+    """
+    generator = BanditReport()
+    baseline_file = os.environ.get(BASELINE_ENV)
+    if baseline_file and os.path.isfile(baseline_file):
+        with open(baseline_file) as baseline:
+            generator.add_report(json.load(baseline))
+
+    current = get_report(manager, sev_level, conf_level, lines)
+    generator.add_report(current)
+    generator.errors = current["errors"]
+    result = generator.to_dict()
+
+    with fileobj:
+        write_report(result, fileobj, 2)
+
+    html_file = os.environ.get(HTML_ENV)
+    if html_file:
+        loader_fs = get_loader_paths(os.environ.get(TEMPLATE_PATH_ENV))
+        template = get_environment(loader_fs).get_template(os.environ.get(TEMPLATE_ENV, 'my_report.html'))
+        options = {"base_uri": os.environ.get(BASE_URI_ENV, '')}
+        with open(html_file, 'w') as html:
+            write_html(result, template, options, profiling.NULL_PROFILER, html)
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright 2019 Victor Torre
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import sqlite3
+import sys
+
+from bandit_tools.baseline_tools import BanditReport
+from bandit_tools.baseline_tools import TS_FORMAT
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS runs (
+        id INTEGER PRIMARY KEY,
+        generated_at TEXT NOT NULL,
+        source TEXT,
+        ingested_at TEXT NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS findings (
+        run_id INTEGER NOT NULL REFERENCES runs(id),
+        fingerprint TEXT NOT NULL,
+        filename TEXT NOT NULL,
+        directory TEXT NOT NULL,
+        test_id TEXT,
+        severity TEXT,
+        confidence TEXT,
+        line_number INTEGER,
+        data TEXT
+    )""",
+    "CREATE INDEX IF NOT EXISTS runs_generated_at ON runs (generated_at)",
+    "CREATE INDEX IF NOT EXISTS findings_fingerprint ON findings (fingerprint, run_id)",
+    "CREATE INDEX IF NOT EXISTS findings_filename ON findings (filename, run_id)",
+    "CREATE INDEX IF NOT EXISTS findings_run ON findings (run_id, fingerprint)",
+    "CREATE INDEX IF NOT EXISTS findings_severity ON findings (severity, run_id, directory)",
+]
+
+
+class HistoryStore(object):
+    """
+    SQLite database with the findings of several Bandit reports.
+    The findings are keyed by BanditReport.get_hash, so a finding moved to other line keeps its fingerprint.
+    """
+
+    def __init__(self, path=':memory:'):
+        self.connection = sqlite3.connect(path)
+        with self.connection:
+            for statement in SCHEMA:
+                self.connection.execute(statement)
+
+    def close(self):
+        self.connection.close()
+
+    def ingest(self, report, source=None):
+        """Add all the findings of the report as a new run on a single transaction"""
+        ingested_at = datetime.datetime.utcnow().strftime(TS_FORMAT)
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO runs (generated_at, source, ingested_at) VALUES (?, ?, ?)",
+                (report.get('generated_at') or ingested_at, source, ingested_at)
+            )
+            run_id = cursor.lastrowid
+            self.connection.executemany(
+                "INSERT INTO findings (run_id, fingerprint, filename, directory, test_id, severity, confidence,"
+                " line_number, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                ((
+                    run_id,
+                    BanditReport.get_hash(hit),
+                    hit['filename'],
+                    os.path.dirname(hit['filename']),
+                    hit.get('test_id'),
+                    hit.get('issue_severity'),
+                    hit.get('issue_confidence'),
+                    hit.get('line_number'),
+                    json.dumps(hit, sort_keys=True),
+                ) for hit in report['results'])
+            )
+        return run_id
+
+    def runs(self):
+        cursor = self.connection.execute(
+            "SELECT id, generated_at, source, (SELECT COUNT(*) FROM findings WHERE run_id = runs.id)"
+            " FROM runs ORDER BY generated_at, id"
+        )
+        return [
+            {"id": run_id, "generated_at": generated_at, "source": source, "findings": findings}
+            for (run_id, generated_at, source, findings) in cursor
+        ]
+
+    def first_seen(self, fingerprint):
+        """The first run with the finding, None if it has never been seen"""
+        row = self.connection.execute(
+            "SELECT runs.id, runs.generated_at, runs.source FROM findings JOIN runs ON runs.id = findings.run_id"
+            " WHERE findings.fingerprint = ? ORDER BY runs.generated_at, runs.id LIMIT 1",
+            (fingerprint,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"id": row[0], "generated_at": row[1], "source": row[2]}
+
+    def trend(self, severity='HIGH', directory=None):
+        """Number of findings with the severity for each run and directory"""
+        query = (
+            "SELECT runs.id, runs.generated_at, findings.directory, COUNT(*)"
+            " FROM findings JOIN runs ON runs.id = findings.run_id WHERE findings.severity = ?"
+        )
+        params = [severity]
+        if directory is not None:
+            query += " AND findings.directory = ?"
+            params.append(directory)
+        query += " GROUP BY runs.id, findings.directory ORDER BY runs.generated_at, runs.id, findings.directory"
+        return [
+            {"id": run_id, "generated_at": generated_at, "directory": name, "findings": findings}
+            for (run_id, generated_at, name, findings) in self.connection.execute(query, params)
+        ]
+
+    def _missing(self, run_id, other_run_id):
+        """
+        Findings of run_id over the occurrences of their fingerprint on other_run_id,
+        as the mix keeps a repeated finding as many times as the report that has it more times.
+        The extra occurrences are the last ones of the run.
+        """
+        cursor = self.connection.execute(
+            "SELECT current.fingerprint, current.total - COALESCE(other.total, 0) FROM"
+            " (SELECT fingerprint, COUNT(*) AS total FROM findings WHERE run_id = ? GROUP BY fingerprint) AS current"
+            " LEFT JOIN"
+            " (SELECT fingerprint, COUNT(*) AS total FROM findings WHERE run_id = ? GROUP BY fingerprint) AS other"
+            " ON other.fingerprint = current.fingerprint WHERE current.total > COALESCE(other.total, 0)",
+            (run_id, other_run_id)
+        )
+        missing = []
+        for (fingerprint, extra) in cursor.fetchall():
+            rows = self.connection.execute(
+                "SELECT data FROM findings WHERE fingerprint = ? AND run_id = ? ORDER BY rowid",
+                (fingerprint, run_id)
+            ).fetchall()
+            missing.extend(json.loads(data) for (data,) in rows[-extra:])
+        missing.sort(key=lambda hit: (hit['filename'], hit.get('line_number') or 0))
+        return missing
+
+    def diff(self, old_run_id, new_run_id):
+        """Findings added and fixed from old run to new run"""
+        return {
+            "new": self._missing(new_run_id, old_run_id),
+            "fixed": self._missing(old_run_id, new_run_id),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tool for store the history of Bandit reports on SQLite')
+
+    parser.add_argument("-d", "--database", dest="database", type=str, default='bandit_history.db',
+                        help="SQLite database file, by default bandit_history.db")
+    parser.add_argument("-o", "--output", dest="output", type=str, help="output file", default=None)
+    commands = parser.add_subparsers(dest="command")
+
+    ingest = commands.add_parser("ingest", help="add reports as new runs")
+    ingest.add_argument("reports", type=str, nargs='+', help="reports on JSON format")
+    commands.add_parser("runs", help="list the runs")
+    first_seen = commands.add_parser("first-seen", help="first run with the finding")
+    first_seen.add_argument("fingerprint", type=str, help="BanditReport.get_hash of the finding")
+    trend = commands.add_parser("trend", help="findings by run and directory")
+    trend.add_argument("--severity", dest="severity", type=str, default='HIGH', help="by default HIGH")
+    trend.add_argument("--directory", dest="directory", type=str, default=None, help="only this directory")
+    diff = commands.add_parser("diff", help="findings new and fixed between two runs")
+    diff.add_argument("old_run", type=int, help="id of the old run")
+    diff.add_argument("new_run", type=int, help="id of the new run")
+
+    options = vars(parser.parse_args())
+    command = options.get('command')
+    if not command:
+        parser.exit(-1, "A command is required")
+
+    store = HistoryStore(options.get('database'))
+    if command == 'ingest':
+        result = []
+        for report_file in options.get('reports'):
+            if not os.path.isfile(report_file):
+                parser.exit(-2, "File {} not found".format(report_file))
+            result.append(store.ingest(json.load(open(report_file)), report_file))
+    elif command == 'runs':
+        result = store.runs()
+    elif command == 'first-seen':
+        result = store.first_seen(options.get('fingerprint'))
+    elif command == 'trend':
+        result = store.trend(options.get('severity'), options.get('directory'))
+    else:
+        result = store.diff(options.get('old_run'), options.get('new_run'))
+    store.close()
+
+    stdout = sys.stdout
+    if options.get('output'):
+        stdout = open(options.get('output'), 'w')
+
+    stdout.write(json.dumps(result, sort_keys=True, indent=2, separators=(',', ': ')))
+    if options.get('output'):
+        stdout.close()
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
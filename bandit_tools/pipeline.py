@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright 2019 Victor Torre
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from bandit_tools import custom_report
+from bandit_tools import profiling
+from bandit_tools.baseline_tools import BanditReport
+from bandit_tools.baseline_tools import fix
+from bandit_tools.baseline_tools import write_report
+from bandit_tools.baseline_tools import zip_report
+
+
+def run_pipeline(reports, fix_hits=False, zip_files=False, workers=1, memory_budget=None, profiler=None):
+    """
+    Mix, fix and zip the reports without serialise them between the steps,
+    as baseline_tools -m ... | baseline_tools --fix --zip does.
+    :param reports: list of report dicts, mixed on this order
+    :return: the report dict
+    """
+    profiler = profiler or profiling.NULL_PROFILER
+    report = reports[0]
+    if len(reports) > 1:
+        with profiler.phase('mix'):
+            generator = BanditReport(profiler, memory_budget)
+            for other in reports:
+                generator.add_report(other)
+            profiler.count_stage('mix', sum(len(other['results']) for other in reports), len(generator._result))
+            report = generator.to_dict()
+    if fix_hits:
+        with profiler.phase('fix'):
+            report = fix(report, profiler, workers, memory_budget)
+    if zip_files:
+        with profiler.phase('zip'):
+            report = zip_report(report)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Tool for mix, fix, zip and render Bandit reports on a single process'
+    )
+
+    parser.add_argument("reports", type=str, nargs='+', help="reports on JSON format, mixed on this order")
+    parser.add_argument("-f", "--fix", dest="fix", default=False, action="store_true",
+                        help="Fix format and data of the mixed report")
+    parser.add_argument("-z", "--zip", dest="zip", default=False, action="store_true",
+                        help="Minimize the result, remove all 0 hits files")
+    parser.add_argument("-j", "--jobs", dest="jobs", type=int, default=1,
+                        help="Number of processes used by --fix, by default 1")
+    parser.add_argument("--memory-budget", dest="memory_budget", type=int, default=None,
+                        help="MB of results kept on memory, the rest are sorted on disk")
+    parser.add_argument("-M", "--machine", dest="machine", default=False, action="store_true",
+                        help="Json format without indent")
+    parser.add_argument("-o", "--output", dest="output", type=str, default=None,
+                        help="output file for the JSON report, by default stdout if no --html")
+    parser.add_argument("--html", dest="html", type=str, default=None, help="output file for the HTML report")
+    custom_report.add_arguments(parser)
+    profiling.add_arguments(parser)
+
+    options = vars(parser.parse_args())
+    profiler = profiling.from_options(options)
+    profiler.start()
+    memory_budget = None
+    if options.get('memory_budget'):
+        memory_budget = options.get('memory_budget') * 1024 * 1024
+
+    template = None
+    if options.get('html'):
+        template = custom_report.get_template(parser, options)
+
+    reports = []
+    for report_file in options.get('reports'):
+        if not os.path.isfile(report_file):
+            parser.exit(-2, "File {} not found".format(report_file))
+        with profiler.phase('parse'):
+            reports.append(json.load(open(report_file)))
+
+    report = run_pipeline(reports, options.get('fix'), options.get('zip'), options.get('jobs'),
+                          memory_budget, profiler)
+
+    if options.get('output') or not options.get('html'):
+        stdout = sys.stdout
+        if options.get('output'):
+            stdout = open(options.get('output'), 'w')
+        indent = None if options.get('machine') else 2
+        with profiler.phase('serialise'):
+            write_report(report, stdout, indent)
+        if options.get('output'):
+            stdout.close()
+
+    if options.get('html'):
+        with open(options.get('html'), 'w') as html:
+            custom_report.write_html(report, template, options, profiler, html)
+
+    profiler.stop()
+    profiling.report_stats(profiler, options)
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright 2019 Victor Torre
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import collections
+import contextlib
+import cProfile
+import json
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
+
+timer = getattr(time, 'perf_counter', time.time)
+
+
+def peak_memory():
+    """Peak resident memory of the process in KiB, None if unknown"""
+    if resource is None:  # pragma: no cover
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':  # pragma: no cover
+        peak //= 1024
+    return peak
+
+
+class NullProfiler(object):
+    """Profiler used when the stats are disabled, every hook is a no-op"""
+    enabled = False
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        yield
+
+    def count(self, name, value=1):
+        pass
+
+    def count_stage(self, stage, hits_in, hits_out):
+        pass
+
+    def timed(self, name, funct):
+        return funct
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
+
+
+class Profiler(NullProfiler):
+    """
+    Collect wall time per phase, counters and peak memory.
+    Phases could be nested, so the time of a phase includes the time of its children.
+    """
+    enabled = True
+
+    def __init__(self, cprofile_file=None):
+        self.phases = collections.OrderedDict()
+        self.counters = collections.OrderedDict()
+        self.cprofile_file = cprofile_file
+        self._cprofile = None
+        self._started_at = None
+        self.total = 0.0
+
+    def _add_time(self, name, elapsed):
+        data = self.phases.setdefault(name, {"calls": 0, "time": 0.0})
+        data["calls"] += 1
+        data["time"] += elapsed
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        started_at = timer()
+        try:
+            yield
+        finally:
+            self._add_time(name, timer() - started_at)
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def timed(self, name, funct):
+        def wrapper(*args, **kwargs):
+            started_at = timer()
+            try:
+                return funct(*args, **kwargs)
+            finally:
+                self._add_time(name, timer() - started_at)
+        return wrapper
+
+    def start(self):
+        self._started_at = timer()
+        if self.cprofile_file:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    def stop(self):
+        if self._cprofile:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(self.cprofile_file)
+            self._cprofile = None
+        if self._started_at is not None:
+            self.total += timer() - self._started_at
+            self._started_at = None
+
+    def count_stage(self, stage, hits_in, hits_out):
+        """Hits in and out of a stage, e.g. mix or fix, for its dedup ratio"""
+        self.count('{}.hits_in'.format(stage), hits_in)
+        self.count('{}.hits_out'.format(stage), hits_out)
+
+    @property
+    def dedup_ratio(self):
+        """Ratio of hits dropped by each stage"""
+        ratios = collections.OrderedDict()
+        for name in self.counters:
+            if name.endswith('.hits_in') and self.counters[name]:
+                stage = name[:-len('.hits_in')]
+                hits_out = self.counters.get('{}.hits_out'.format(stage), 0)
+                ratios[stage] = 1.0 - float(hits_out) / self.counters[name]
+        return ratios
+
+    def stats(self):
+        return {
+            "total": self.total,
+            "phases": dict(self.phases),
+            "counters": dict(self.counters),
+            "dedup_ratio": dict(self.dedup_ratio),
+            "peak_memory_kb": peak_memory(),
+        }
+
+    def write(self, stream):
+        stream.write("{:<16} {:>8} {:>12}\n".format("phase", "calls", "seconds"))
+        for name, data in self.phases.items():
+            stream.write("{:<16} {:>8} {:>12.6f}\n".format(name, data["calls"], data["time"]))
+        stream.write("{:<16} {:>8} {:>12.6f}\n".format("total", "", self.total))
+        for name, value in self.counters.items():
+            stream.write("{}: {}\n".format(name, value))
+        for stage, ratio in self.dedup_ratio.items():
+            stream.write("{}.dedup_ratio: {:.4f}\n".format(stage, ratio))
+        stream.write("peak_memory_kb: {}\n".format(peak_memory()))
+
+
+def add_arguments(parser):
+    parser.add_argument("-s", "--stats", dest="stats", default=False, action="store_true",
+                        help="Write time per phase, hit counts and peak memory on stderr")
+    parser.add_argument("--stats-file", dest="stats_file", type=str, default=None,
+                        help="Write the stats as JSON on this file")
+    parser.add_argument("--profile", dest="profile", type=str, default=None,
+                        help="Dump the cProfile stats on this file")
+
+
+def from_options(options):
+    if not (options.get('stats') or options.get('stats_file') or options.get('profile')):
+        return NULL_PROFILER
+    return Profiler(cprofile_file=options.get('profile'))
+
+
+def report_stats(profiler, options):
+    if not profiler.enabled:
+        return
+    if options.get('stats'):
+        profiler.write(sys.stderr)
+    if options.get('stats_file'):
+        with open(options.get('stats_file'), 'w') as stats_file:
+            json.dump(profiler.stats(), stats_file, sort_keys=True, indent=2, separators=(',', ': '))
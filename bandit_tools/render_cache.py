@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright 2019 Victor Torre
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import collections
+import hashlib
+import json
+import os
+
+from markupsafe import Markup
+
+CACHE_VERSION = 1
+ISSUE_NO = '__bandit_tools_issue_no__'
+
+
+class RenderCache(object):
+    """
+    LRU cache of the rendered issue fragments.
+    The key is the fingerprint of the issue and the hash of the issue template,
+    the issue number is replaced after render so the fragment is valid in any position.
+    """
+
+    def __init__(self, template, max_entries=50000, max_size=None):
+        self.template = template
+        self.template_hash = RenderCache.get_template_hash(template)
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.entries = collections.OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def get_template_hash(template):
+        source = template.environment.loader.get_source(template.environment, template.name)[0]
+        return hashlib.md5(source.encode('utf8')).hexdigest()
+
+    @staticmethod
+    def get_fingerprint(issue):
+        data = json.dumps(issue, sort_keys=True, separators=(',', ':'))
+        return hashlib.md5(data.encode('utf8')).hexdigest()
+
+    def _store(self, key, fragment):
+        self.entries[key] = fragment
+        self.size += len(fragment)
+        while self.entries and (len(self.entries) > self.max_entries or
+                                (self.max_size is not None and self.size > self.max_size)):
+            (_, evicted) = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def get_key(self, issue):
+        return '{}:{}'.format(self.template_hash, RenderCache.get_fingerprint(issue))
+
+    def get_fragment(self, issue):
+        key = self.get_key(issue)
+        fragment = self.entries.pop(key, None)
+        if fragment is None:
+            self.misses += 1
+            fragment = self.template.render(issue=issue, issue_no=ISSUE_NO)
+        else:
+            self.hits += 1
+            self.size -= len(fragment)
+        self._store(key, fragment)
+        return fragment
+
+    def render(self, issue, issue_no):
+        return Markup(self.get_fragment(issue).replace(ISSUE_NO, str(issue_no)))
+
+    def load(self, path):
+        if not os.path.isfile(path):
+            return
+        with open(path) as cache_file:
+            data = json.load(cache_file)
+        if data.get('version') != CACHE_VERSION:
+            return
+        for (key, fragment) in data.get('entries', []):
+            if key.startswith(self.template_hash):
+                self._store(key, fragment)
+
+    def save(self, path):
+        data = {
+            'version': CACHE_VERSION,
+            'entries': list(self.entries.items()),
+        }
+        with open(path, 'w') as cache_file:
+            json.dump(data, cache_file, separators=(',', ':'))
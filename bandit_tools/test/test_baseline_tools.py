@@ -1,6 +1,14 @@
 from bandit_tools.baseline_tools import BanditReport
 from bandit_tools.baseline_tools import BASE_DICT
 from bandit_tools.baseline_tools import main
+from bandit_tools.baseline_tools import filter_report
+from bandit_tools.baseline_tools import fix
+from bandit_tools.baseline_tools import mix_report
+from bandit_tools.baseline_tools import fix_shard
+from bandit_tools.baseline_tools import get_shards
+from bandit_tools.baseline_tools import init_shard_worker
+from bandit_tools.benchmark.generator import generate_report
+from bandit_tools.bloom import BloomFilter
 
 import pytest
 
@@ -366,3 +374,314 @@ def test_main_mix_file(monkeypatch):
 
     finally:
         os.remove(out_file)
+
+
+def get_query_report():
+    report = BanditReport()
+    report.add_file('src/payments/api.py', 100, 1)
+    report.add_file('src/payments/models.py', 50, 0)
+    report.add_file('src/paymentsx.py', 10, 0)
+    report.add_file('tests/test_api.py', 20, 0)
+    hits = [
+        ('src/payments/api.py', 'B101', 'LOW', 'HIGH'),
+        ('src/payments/api.py', 'B602', 'HIGH', 'HIGH'),
+        ('src/payments/models.py', 'B608', 'MEDIUM', 'LOW'),
+        ('src/paymentsx.py', 'B602', 'HIGH', 'MEDIUM'),
+        ('tests/test_api.py', 'B101', 'LOW', 'HIGH'),
+    ]
+    for (num, (filename, test_id, severity, confidence)) in enumerate(hits):
+        report.add_hit({
+            "filename": filename,
+            "test_id": test_id,
+            "issue_severity": severity,
+            "issue_confidence": confidence,
+            "issue_text": str(num),
+        })
+    return report
+
+
+def test_bandit_report_indexes():
+    report = get_query_report()
+    indexes = report.indexes
+    assert indexes['filename']['src/payments/api.py'] == [0, 1]
+    assert indexes['test_id']['B101'] == [0, 4]
+    assert indexes['severity']['HIGH'] == [1, 3]
+    assert indexes['confidence']['LOW'] == [2]
+    assert report.indexes is indexes
+
+    report.add_file('other.py', 1, 0)
+    assert report.indexes is not indexes
+    assert report.indexes['filenames'][0] == 'other.py'
+
+
+def test_bandit_report_get_filenames():
+    report = get_query_report()
+    assert report.get_filenames('src/payments/') == ['src/payments/api.py', 'src/payments/models.py']
+    assert report.get_filenames('src/payments') == ['src/payments/api.py', 'src/payments/models.py',
+                                                    'src/paymentsx.py']
+    assert report.get_filenames('none/') == []
+    assert len(report.get_filenames()) == 4
+
+
+def test_bandit_report_query_without_filters():
+    report = get_query_report()
+    assert report.query().to_dict()['metrics'] == report.metrics
+
+
+def test_bandit_report_query_path_and_severity():
+    report = get_query_report()
+    filtered = report.query(path='src/payments/', severity='MEDIUM')
+    result = filtered.to_dict()
+    assert [hit['issue_text'] for hit in result['results']] == ['1', '2']
+
+    totals = result['metrics']['_totals']
+    assert sorted(result['metrics']) == ['_totals', 'src/payments/api.py', 'src/payments/models.py']
+    assert totals['loc'] == 150
+    assert totals['nosec'] == 1
+    assert totals['SEVERITY.HIGH'] == 1
+    assert totals['SEVERITY.MEDIUM'] == 1
+    assert totals['SEVERITY.LOW'] == 0
+    assert totals['CONFIDENCE.HIGH'] == 1
+    assert totals['CONFIDENCE.LOW'] == 1
+
+
+def test_bandit_report_query_test_ids_and_confidence():
+    report = get_query_report()
+    result = report.query(test_ids=['B101', 'B602'], confidence='HIGH').to_dict()
+    assert [hit['issue_text'] for hit in result['results']] == ['0', '1', '4']
+    assert len(result['metrics']) == 5
+
+    result = report.query(test_ids=['B999']).to_dict()
+    assert result['results'] == []
+
+
+def test_filter_report_keeps_duplicated_hits():
+    report = get_repeated_report([4, 4, 14])
+    result = filter_report(report, severity='MEDIUM')
+    assert [hit['line_number'] for hit in result['results']] == [4, 4, 14]
+    assert result['metrics']['_totals']['SEVERITY.MEDIUM'] == 3
+
+    assert filter_report(report, severity='HIGH')['results'] == []
+
+
+def test_main_filter(monkeypatch):
+    out_file = os.path.join(BASE_PATH, 'test_report.json')
+    monkeypatch.setattr(sys, "argv", ['app.py', os.path.join(BASE_PATH, 'report_example.json'),
+                                      '--path', 'examples/', '--severity', 'HIGH', '--confidence', 'HIGH',
+                                      '--test-id', 'B602', '--output', out_file])
+    main()
+    try:
+        report = json.load(open(out_file))
+        assert report['results']
+        for hit in report['results']:
+            assert hit['test_id'] == 'B602'
+            assert hit['issue_severity'] == 'HIGH'
+            assert hit['issue_confidence'] == 'HIGH'
+        totals = report['metrics']['_totals']
+        assert totals['SEVERITY.HIGH'] == len(report['results'])
+        assert totals['SEVERITY.LOW'] == 0
+    finally:
+        os.remove(out_file)
+
+
+def test_get_shards_by_filename():
+    report = generate_report(files=10, hits_per_file=3)
+    shards = get_shards(report, 4)
+    assert len(shards) == 4
+    assert sorted(position for shard in shards for position in shard) == list(range(30))
+    seen = set()
+    for shard in shards:
+        filenames = set(report['results'][position]['filename'] for position in shard)
+        assert not filenames & seen
+        seen.update(filenames)
+
+
+def test_fix_shard_returns_positions():
+    report = generate_report(files=2, hits_per_file=3)
+    report['results'].append(dict(report['results'][1]))
+    init_shard_worker(report['results'])
+    (positions, metrics) = fix_shard(list(range(7)))
+    assert positions == list(range(6))
+    filename = report['results'][0]['filename']
+    assert metrics[filename]['CONFIDENCE.' + report['results'][0]['issue_confidence']] >= 1
+    assert sum(metrics[name][key] for name in metrics for key in metrics[name] if key.startswith('SEVERITY')) == 6
+
+
+def test_get_shards_more_workers_than_files():
+    report = generate_report(files=2, hits_per_file=3)
+    assert len(get_shards(report, 8)) == 2
+
+
+def test_fix_parallel_same_output():
+    report = generate_report(files=20, hits_per_file=5, duplicate_ratio=0.3)
+    report['results'].append(dict(report['results'][0]))
+    expected = fix(report)
+    result = fix(report, workers=3)
+    result['generated_at'] = expected['generated_at']
+    assert result == expected
+
+
+def test_fix_parallel_aliased_hits():
+    report = generate_report(files=4, hits_per_file=3)
+    report['results'] = report['results'] * 2
+    expected = fix(report)
+    result = fix(report, workers=2)
+    assert len(result['results']) == 12
+    assert result['results'] == expected['results']
+    assert result['metrics'] == expected['metrics']
+
+
+def test_fix_parallel_hit_to_no_existed_file():
+    report = generate_report(files=2, hits_per_file=1)
+    del report['metrics'][report['results'][0]['filename']]
+    with pytest.raises(KeyError):
+        fix(report, workers=2)
+
+
+def test_main_fix_jobs(monkeypatch):
+    out_file = os.path.join(BASE_PATH, 'test_report.json')
+    report_file = os.path.join(BASE_PATH, 'report_example.json')
+    monkeypatch.setattr(sys, "argv", ['app.py', report_file, '--fix', '--jobs', '2', '--output', out_file])
+    main()
+    try:
+        report = json.load(open(out_file))
+        expected = fix(json.load(open(report_file)))
+        assert report['results'] == expected['results']
+        assert report['metrics'] == expected['metrics']
+    finally:
+        os.remove(out_file)
+
+
+def get_repeated_report(lines):
+    results = []
+    for line in lines:
+        results.append({
+            "filename": "examples/example_system.py",
+            "issue_confidence": "MEDIUM",
+            "issue_severity": "MEDIUM",
+            "code": "{} os.system(sys.argsv[1])\n".format(line),
+            "line_number": line,
+            "line_range": [line],
+        })
+    metrics = {"examples/example_system.py": BASE_DICT.copy()}
+    return {"metrics": metrics, "results": results}
+
+
+def test_mix_report_keeps_repeated_hits():
+    empty = get_repeated_report([])
+    mixed = mix_report(get_repeated_report([4, 14]), empty)
+    assert [hit['line_number'] for hit in mixed['results']] == [4, 14]
+    assert mixed['metrics']['_totals']['SEVERITY.MEDIUM'] == 2
+
+
+def test_mix_report_max_occurrences():
+    mixed = mix_report(get_repeated_report([4, 14]), get_repeated_report([5, 15, 25]))
+    assert [hit['line_number'] for hit in mixed['results']] == [4, 14, 25]
+
+    mixed = mix_report(get_repeated_report([5, 15, 25]), get_repeated_report([4, 14]))
+    assert [hit['line_number'] for hit in mixed['results']] == [5, 15, 25]
+
+    report = get_repeated_report([4, 14])
+    mixed = mix_report(report, report)
+    assert [hit['line_number'] for hit in mixed['results']] == [4, 14]
+
+
+def test_bandit_report_query_keeps_repeated_hits():
+    report = BanditReport()
+    report.add_report(get_repeated_report([4, 14]))
+    assert len(report.to_dict()['results']) == 2
+    assert [hit['line_number'] for hit in report.query().to_dict()['results']] == [4, 14]
+    result = report.query(severity='LOW').to_dict()
+    assert [hit['line_number'] for hit in result['results']] == [4, 14]
+    assert result['metrics']['_totals']['SEVERITY.MEDIUM'] == 2
+
+
+def test_bandit_report_without_count_occurrences():
+    report = BanditReport()
+    report.count_occurrences = False
+    report.add_report(get_repeated_report([4, 14]))
+    assert len(report.to_dict()['results']) == 1
+
+
+def test_bandit_report_add_hit_occurrence():
+    report = BanditReport()
+    report.add_file('filename', 100, 10)
+    hit = {
+        "issue_confidence": 'LOW',
+        "issue_severity": 'MEDIUM',
+        "filename": 'filename'
+    }
+    report.add_hit(hit)
+    report.add_hit(hit, occurrence=1)
+    report.add_hit(hit, occurrence=2)
+    assert report.metrics['_totals']["SEVERITY.MEDIUM"] == 2
+
+
+def test_mix_report_approximate():
+    base = generate_report(files=20, duplicate_ratio=0.3)
+    other = generate_report(files=20, duplicate_ratio=0.3, seed=1)
+    other['results'] += base['results'][::2]
+    expected = mix_report(base, other)
+    mixed = mix_report(base, other, bloom_filter=BloomFilter(1000, 0.000001))
+    assert mixed['results'] == expected['results']
+    assert mixed['metrics'] == expected['metrics']
+
+    mixed = mix_report(get_repeated_report([4, 14]), get_repeated_report([5, 15, 25]),
+                       bloom_filter=BloomFilter(10, 0.000001))
+    assert [hit['line_number'] for hit in mixed['results']] == [4, 14, 25]
+
+
+def test_mix_report_approximate_reused_filter():
+    (first, second, third) = [generate_report(files=20, duplicate_ratio=0.3, seed=seed) for seed in range(3)]
+    bloom_filter = BloomFilter(1000, 0.000001)
+    mixed = mix_report(first, second, bloom_filter=bloom_filter)
+    mixed = mix_report(mixed, third, bloom_filter=bloom_filter)
+    expected = mix_report(mix_report(first, second), third)
+    assert mixed['results'] == expected['results']
+    assert mixed['metrics'] == expected['metrics']
+
+
+def test_main_mix_approximate(monkeypatch, tmpdir):
+    out_file = str(tmpdir.join('report.json'))
+    bloom_file = str(tmpdir.join('hits.bloom'))
+    argv = ['app.py', os.path.join(BASE_PATH, 'manual_report_example.json'),
+            '--mixed', os.path.join(BASE_PATH, 'mix_report_example.json'),
+            '--approximate', '0.0001', '--bloom-capacity', '100', '--bloom-file', bloom_file, '--output', out_file]
+    monkeypatch.setattr(sys, "argv", argv)
+    main()
+    base = json.load(open(os.path.join(BASE_PATH, 'manual_report_example.json')))
+    other = json.load(open(os.path.join(BASE_PATH, 'mix_report_example.json')))
+    assert json.load(open(out_file))['results'] == mix_report(base, other)['results']
+    assert os.path.isfile(bloom_file)
+
+    main()  # The hits of the mixed report are on the filter, the base ones are kept
+    empty = {'metrics': {}, 'results': []}
+    assert json.load(open(out_file))['results'] == mix_report(base, empty)['results']
+
+
+def test_main_mix_approximate_reused_filter(monkeypatch, tmpdir, capsys):
+    paths = []
+    for seed in range(3):
+        paths.append(str(tmpdir.join('report{}.json'.format(seed))))
+        json.dump(generate_report(files=10, hits_per_file=5, seed=seed), open(paths[-1], 'w'))
+    out_file = str(tmpdir.join('mixed.json'))
+    bloom_file = str(tmpdir.join('hits.bloom'))
+    options = ['--bloom-file', bloom_file, '--output', out_file]
+
+    monkeypatch.setattr(sys, "argv", ['app.py', paths[0], '--mixed', paths[1], '--approximate', '0.01',
+                                      '--bloom-capacity', '120'] + options)
+    main()
+    assert 'over its capacity' not in capsys.readouterr().err
+
+    monkeypatch.setattr(sys, "argv", ['app.py', out_file, '--mixed', paths[2], '--approximate', '0.001'] + options)
+    main()
+    errors = capsys.readouterr().err
+    assert 'keeps its false positive rate 0.01 and capacity 120' in errors
+    assert 'over its capacity of 120 hits' in errors
+    assert len(json.load(open(out_file))['results']) > 100
+
+    exit_mock = ExitMock()
+    monkeypatch.setattr(argparse.ArgumentParser, "exit", exit_mock.exit)
+    with pytest.raises(SystemExit):
+        main()
+    assert exit_mock.CALL_ARGS[0] == -4
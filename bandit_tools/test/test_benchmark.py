@@ -0,0 +1,55 @@
+from bandit_tools.baseline_tools import BanditReport
+from bandit_tools.baseline_tools import fix
+from bandit_tools.benchmark.generator import generate_report
+from bandit_tools.benchmark import run
+
+import json
+import sys
+
+
+def test_generate_report_is_reproducible():
+    assert generate_report(files=5, seed=3) == generate_report(files=5, seed=3)
+    assert generate_report(files=5, seed=3) != generate_report(files=5, seed=4)
+
+
+def test_generate_report_scale():
+    report = generate_report(files=7, hits_per_file=3, snippet_lines=5)
+    assert len(report['metrics']) == 8
+    assert len(report['results']) == 21
+    for hit in report['results']:
+        assert len(hit['code'].strip().split('\n')) == 5
+
+
+def test_generate_report_metrics_are_fixed():
+    report = generate_report(files=10, hits_per_file=4, duplicate_ratio=0.5)
+    assert fix(report)['metrics'] == report['metrics']
+
+
+def test_generate_report_duplicates():
+    report = generate_report(files=10, hits_per_file=10, duplicate_ratio=0.5)
+    hashes = set(BanditReport.get_hash(hit) for hit in report['results'])
+    assert len(hashes) < len(report['results'])
+
+    report = generate_report(files=10, hits_per_file=10, duplicate_ratio=0)
+    hashes = set(BanditReport.get_hash(hit) for hit in report['results'])
+    assert len(hashes) == len(report['results'])
+
+
+def test_run_benchmarks():
+    params = {'files': 4, 'hits_per_file': 2, 'duplicate_ratio': 0.1, 'snippet_lines': 3, 'seed': 0}
+    results = run.run_benchmarks(params, repeat=1)
+    assert list(results['results']) == list(run.BENCHMARKS)
+    assert results['hits'] == 8
+    for data in results['results'].values():
+        assert data['best'] <= data['mean']
+
+
+def test_main_compare(monkeypatch, tmpdir):
+    out_file = str(tmpdir.join('bench.json'))
+    monkeypatch.setattr(sys, "argv", ['app.py', '--files', '4', '-r', '1', '-b', 'fix', '-o', out_file])
+    run.main()
+    previous = json.load(open(out_file))
+    assert list(previous['results']) == ['fix']
+
+    monkeypatch.setattr(sys, "argv", ['app.py', '--files', '4', '-r', '1', '-b', 'fix', '-c', out_file])
+    run.main()
@@ -0,0 +1,65 @@
+from bandit_tools.bloom import BloomFilter
+
+import pytest
+
+import io
+
+
+def test_bloom_filter_add():
+    bloom_filter = BloomFilter(100)
+    assert 'key' not in bloom_filter
+    assert bloom_filter.add('key')
+    assert 'key' in bloom_filter
+    assert not bloom_filter.add('key')
+    assert len(bloom_filter) == 1
+
+
+def test_bloom_filter_sizing():
+    bloom_filter = BloomFilter(1000, 0.01)
+    assert bloom_filter.num_hashes == 7
+    assert bloom_filter.size == 1199
+    assert BloomFilter(1000, 0.001).size > bloom_filter.size
+
+
+def test_bloom_filter_false_positives():
+    bloom_filter = BloomFilter(10000, 0.01)
+    for num in range(10000):
+        bloom_filter.add('key{}'.format(num))
+    for num in range(10000):
+        assert 'key{}'.format(num) in bloom_filter
+    false_positives = sum('other{}'.format(num) in bloom_filter for num in range(10000))
+    assert false_positives < 200
+    assert 0.005 < bloom_filter.false_positive_rate < 0.02
+    assert 0 < bloom_filter.expected_false_positives < 100
+
+
+def test_bloom_filter_dump_load():
+    bloom_filter = BloomFilter(50, 0.05)
+    for num in range(30):
+        bloom_filter.add('key{}'.format(num))
+    stream = io.BytesIO()
+    bloom_filter.dump(stream)
+    stream.seek(0)
+
+    loaded = BloomFilter.load(stream)
+    assert loaded.bits == bloom_filter.bits
+    assert (loaded.capacity, loaded.error_rate, loaded.num_hashes) == (50, 0.05, bloom_filter.num_hashes)
+    assert len(loaded) == 30
+    assert loaded.expected_false_positives == bloom_filter.expected_false_positives
+    assert 'key7' in loaded
+
+
+def test_bloom_filter_load_invalid():
+    with pytest.raises(ValueError):
+        BloomFilter.load(io.BytesIO(b'{"results": []}'))
+    stream = io.BytesIO()
+    BloomFilter(50).dump(stream)
+    with pytest.raises(ValueError):
+        BloomFilter.load(io.BytesIO(stream.getvalue()[:-1]))
+
+
+def test_bloom_filter_invalid_params():
+    with pytest.raises(ValueError):
+        BloomFilter(0)
+    with pytest.raises(ValueError):
+        BloomFilter(10, 1.5)
@@ -3,8 +3,12 @@ import bandit_tools.custom_report
 import pytest
 
 import argparse
+import base64
+import json
+import re
 import sys
 import os
+import zlib
 
 BASE_PATH = os.path.dirname(os.path.abspath(__file__))
 
@@ -167,3 +171,57 @@ def test_main_with_base_url_file(monkeypatch):
         assert '<base href = "file:///localhost/"/>' in open(out_file).read()
     finally:
         os.remove(out_file)
+
+
+def read_chunk(path):
+    data = open(path).read()
+    match = re.match(r'^banditChunk\((\d+), "([^"]*)"\);\n$', data)
+    return int(match.group(1)), json.loads(zlib.decompress(base64.b64decode(match.group(2)), 31).decode('utf8'))
+
+
+def test_main_lazy_without_output(monkeypatch):
+    exit_mock = ExitMock()
+    monkeypatch.setattr(argparse.ArgumentParser, "exit", exit_mock.exit)
+    monkeypatch.setattr(sys, "argv", ['app.py', os.path.join(BASE_PATH, 'report_example.json'), '--lazy'])
+    with pytest.raises(SystemExit):
+        bandit_tools.custom_report.main()
+    assert exit_mock.CALL_ARGS == (-3, 'The lazy mode needs an output file')
+
+
+def test_main_lazy(monkeypatch, tmpdir):
+    out_file = str(tmpdir.join('report.html'))
+    chunk_dir = str(tmpdir.join('report_chunks'))
+    report_file = os.path.join(BASE_PATH, 'report_example.json')
+    report = json.load(open(report_file))
+    os.makedirs(chunk_dir)
+    open(os.path.join(chunk_dir, 'results-999999.js'), 'w').close()
+    monkeypatch.setattr(sys, "argv", ['app.py', report_file, '--lazy', '--chunk-size', '100',
+                                      '--output', out_file])
+    bandit_tools.custom_report.main()
+
+    html = open(out_file).read()
+    num_chunks = (len(report['results']) + 99) // 100
+    assert 'var numChunks = {};'.format(num_chunks) in html
+    assert '<span id="loc">{}</span>'.format(report['metrics']['_totals']['loc']) in html
+    assert '<div id="issue-1">' not in html
+
+    chunks = sorted(os.listdir(chunk_dir))
+    assert len(chunks) == num_chunks
+    results = []
+    for (num, name) in enumerate(chunks):
+        (index, issues) = read_chunk(os.path.join(chunk_dir, name))
+        assert index == num
+        results.extend(issues)
+    assert results == report['results']
+
+
+def test_main_lazy_with_base(monkeypatch, tmpdir):
+    out_file = str(tmpdir.join('lz.html'))
+    monkeypatch.setattr(sys, "argv", ['app.py', os.path.join(BASE_PATH, 'report_example.json'), '--lazy',
+                                      '--base', '/src', '--output', out_file])
+    bandit_tools.custom_report.main()
+
+    html = open(out_file).read()
+    assert '<base href = "file:///src/"/>' in html
+    assert 'var chunkDir = new URL("lz_chunks", document.location.href).href;' in html
+    assert os.path.isfile(str(tmpdir.join('lz_chunks', 'results-000000.js')))
@@ -0,0 +1,113 @@
+from bandit_tools.baseline_tools import fix
+from bandit_tools.baseline_tools import main
+from bandit_tools.baseline_tools import mix_report
+from bandit_tools.baseline_tools import write_report
+from bandit_tools.benchmark.generator import generate_report
+from bandit_tools.external_sort import ExternalSorter
+
+import pytest
+
+import io
+import json
+import operator
+import os
+import sys
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_external_sorter_stable_sort():
+    items = [{'filename': name, 'num': num} for (num, name) in enumerate('cabcabcab')]
+    sorter = ExternalSorter(memory_budget=60)
+    sorter.extend(items)
+    assert len(sorter) == 9
+    assert sorter.num_runs > 1
+    expected = sorted(items, key=operator.itemgetter('filename'))
+    assert list(sorter) == expected
+    assert list(sorter) == expected
+    sorter.close()
+
+
+def test_external_sorter_max_open_runs(monkeypatch):
+    read_run = ExternalSorter._read_run
+    open_runs = {'now': 0, 'max': 0}
+
+    def counted_read_run(path):
+        open_runs['now'] += 1
+        open_runs['max'] = max(open_runs['max'], open_runs['now'])
+        for item in read_run(path):
+            yield item
+        open_runs['now'] -= 1
+    monkeypatch.setattr(ExternalSorter, '_read_run', staticmethod(counted_read_run))
+
+    items = [{'filename': 'file{}'.format(num % 7), 'num': num} for num in range(60)]
+    sorter = ExternalSorter(memory_budget=30, max_open_runs=3)
+    sorter.extend(items)
+    assert sorter.num_runs > 9
+    expected = sorted(items, key=operator.itemgetter('filename'))
+    assert list(sorter) == expected
+    assert open_runs['max'] <= 3
+    assert sorter.num_runs < 3
+    assert len(os.listdir(sorter._tmp_dir)) == sorter.num_runs
+    assert list(sorter) == expected
+    sorter.close()
+
+
+def test_external_sorter_on_memory():
+    sorter = ExternalSorter(memory_budget=1024 * 1024)
+    sorter.extend([{'filename': 'b'}, {'filename': 'a'}])
+    assert sorter.num_runs == 0
+    assert list(sorter) == [{'filename': 'a'}, {'filename': 'b'}]
+
+
+def test_external_sorter_close_remove_files():
+    sorter = ExternalSorter(memory_budget=1)
+    sorter.append({'filename': 'a'})
+    tmp_dir = sorter._tmp_dir
+    assert os.path.isdir(tmp_dir)
+    sorter.close()
+    assert not os.path.isdir(tmp_dir)
+
+
+@pytest.mark.parametrize('indent', [None, 2])
+def test_write_report_as_json_dumps(indent):
+    report = generate_report(files=5, hits_per_file=3)
+    expected = json.dumps(report, sort_keys=True, indent=indent, separators=(',', ': '))
+
+    sorter = ExternalSorter(memory_budget=500)
+    sorter.extend(report['results'])
+    stream = io.StringIO()
+    write_report(dict(report, results=sorter), stream, indent)
+    assert stream.getvalue() == expected
+
+    stream = io.StringIO()
+    write_report(dict(report, results=ExternalSorter(memory_budget=500)), stream, indent)
+    assert stream.getvalue() == json.dumps(dict(report, results=[]), sort_keys=True, indent=indent,
+                                           separators=(',', ': '))
+
+
+def test_mix_and_fix_external_sort():
+    report = generate_report(files=20, hits_per_file=5, duplicate_ratio=0.3)
+    other = generate_report(files=20, hits_per_file=5, seed=1)
+    expected = mix_report(report, other)
+    mixed = mix_report(report, other, memory_budget=2000)
+    assert list(mixed['results']) == expected['results']
+    assert mixed['metrics'] == expected['metrics']
+
+    fixed = fix(mixed, memory_budget=2000, workers=2)
+    assert list(fixed['results']) == fix(expected)['results']
+
+
+def test_main_memory_budget(monkeypatch, tmpdir):
+    out_file = str(tmpdir.join('report.json'))
+    expected_file = str(tmpdir.join('expected.json'))
+    args = ['app.py', os.path.join(BASE_PATH, 'manual_report_example.json'),
+            '--mixed', os.path.join(BASE_PATH, 'report_example.json'), '--fix']
+    monkeypatch.setattr(sys, "argv", args + ['--output', expected_file])
+    main()
+    monkeypatch.setattr(sys, "argv", args + ['--memory-budget', '1', '--output', out_file])
+    main()
+    expected = json.load(open(expected_file))
+    report = json.load(open(out_file))
+    assert report['results'] == expected['results']
+    assert report['metrics'] == expected['metrics']
@@ -0,0 +1,72 @@
+from bandit.core import config
+from bandit.core import manager
+
+from bandit_tools import formatter
+from bandit_tools.baseline_tools import BanditReport
+
+import io
+import json
+import linecache
+import os
+
+CODE = "import subprocess\nassert True\neval(x)\nassert True\n"
+
+
+class OutputMock(io.StringIO):
+    VALUE = None
+
+    def close(self):
+        OutputMock.VALUE = self.getvalue()
+        super(OutputMock, self).close()
+
+
+def get_manager(tmpdir, code=CODE):
+    code_file = tmpdir.join('example.py')
+    code_file.write(code)
+    linecache.clearcache()
+    bandit_manager = manager.BanditManager(config.BanditConfig(), 'file')
+    bandit_manager.discover_files([str(code_file)])
+    bandit_manager.run_tests()
+    return bandit_manager
+
+
+def run_formatter(bandit_manager):
+    formatter.report(bandit_manager, OutputMock(), 'LOW', 'LOW')
+    return json.loads(OutputMock.VALUE)
+
+
+def test_get_hash_bandit_issue(tmpdir):
+    hits = formatter.get_report(get_manager(tmpdir), 'LOW', 'LOW')['results']
+    assert len(hits) == 4
+    assert BanditReport.get_hash(hits[1]) == BanditReport.get_hash(hits[3])
+    assert BanditReport.get_hash(hits[1], False) != BanditReport.get_hash(hits[3], False)
+
+
+def test_report(tmpdir, monkeypatch):
+    monkeypatch.delenv(formatter.BASELINE_ENV, raising=False)
+    monkeypatch.delenv(formatter.HTML_ENV, raising=False)
+    result = run_formatter(get_manager(tmpdir))
+    assert len(result['results']) == 4
+    totals = result['metrics']['_totals']
+    assert totals['loc'] == 4
+    assert totals['SEVERITY.LOW'] == 3
+    assert totals['SEVERITY.MEDIUM'] == 1
+    assert result['results'][0]['more_info'] == formatter.get_bandit_url(result['results'][0]['test_id'])
+
+
+def test_report_with_baseline_and_html(tmpdir, monkeypatch):
+    baseline = run_formatter(get_manager(tmpdir, "assert True\n"))
+    baseline_file = str(tmpdir.join('baseline.json'))
+    html_file = str(tmpdir.join('report.html'))
+    with open(baseline_file, 'w') as output:
+        json.dump(baseline, output)
+    monkeypatch.setenv(formatter.BASELINE_ENV, baseline_file)
+    monkeypatch.setenv(formatter.HTML_ENV, html_file)
+
+    result = run_formatter(get_manager(tmpdir))
+    assert len(result['results']) == 4
+    assert [hit['line_number'] for hit in result['results'] if hit['test_id'] == 'B101'] == [1, 4]
+    assert result['metrics']['_totals']['loc'] == 1
+    html = open(html_file).read()
+    assert 'id="issue-4"' in html
+    assert os.path.basename(str(tmpdir.join('example.py'))) in html
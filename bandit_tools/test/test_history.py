@@ -0,0 +1,128 @@
+from bandit_tools.baseline_tools import BanditReport
+from bandit_tools.benchmark.generator import generate_report
+from bandit_tools.history import HistoryStore
+from bandit_tools.history import main
+
+import pytest
+
+import argparse
+import copy
+import json
+import os
+import sys
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+
+
+class ExitMock(object):
+    CALL_ARGS = None
+    CALL_KWARGS = None
+
+    def exit(self, *args, **kwargs):
+        self.CALL_ARGS = args
+        self.CALL_KWARGS = kwargs
+        raise SystemExit()
+
+
+def get_store():
+    store = HistoryStore()
+    first = generate_report(files=4, hits_per_file=3, duplicate_ratio=0)
+    first['generated_at'] = "2019-03-01T00:00:00Z"
+    second = copy.deepcopy(first)
+    second['generated_at'] = "2019-03-02T00:00:00Z"
+    fixed = second['results'].pop(0)
+    new = generate_report(files=1, hits_per_file=1, seed=5)['results'][0]
+    second['results'].append(new)
+    store.ingest(first, 'first.json')
+    store.ingest(second, 'second.json')
+    return store, first, fixed, new
+
+
+def test_history_runs():
+    store = get_store()[0]
+    runs = store.runs()
+    assert [run['source'] for run in runs] == ['first.json', 'second.json']
+    assert [run['findings'] for run in runs] == [12, 12]
+
+
+def test_history_first_seen():
+    (store, first, fixed, new) = get_store()
+    assert store.first_seen(BanditReport.get_hash(first['results'][3]))['source'] == 'first.json'
+    assert store.first_seen(BanditReport.get_hash(new))['source'] == 'second.json'
+    assert store.first_seen('not_exist') is None
+
+
+def test_history_diff():
+    (store, first, fixed, new) = get_store()
+    diff = store.diff(1, 2)
+    assert diff['new'] == [new]
+    assert diff['fixed'] == [fixed]
+    assert store.diff(1, 1) == {"new": [], "fixed": []}
+
+
+def test_history_diff_repeated_findings():
+    store = HistoryStore()
+    report = generate_report(files=2, hits_per_file=2, duplicate_ratio=0)
+    store.ingest(report)
+    repeated = copy.deepcopy(report)
+    extra = dict(report['results'][1], line_number=report['results'][1]['line_number'] + 10)
+    repeated['results'].append(extra)
+    store.ingest(repeated)
+
+    assert store.diff(1, 2) == {"new": [extra], "fixed": []}
+    assert store.diff(2, 1) == {"new": [], "fixed": [extra]}
+    assert store.diff(2, 2) == {"new": [], "fixed": []}
+    trend = store.trend(extra['issue_severity'])
+    totals = [sum(item['findings'] for item in trend if item['id'] == run_id) for run_id in [1, 2]]
+    assert totals[1] == totals[0] + 1
+
+
+def test_history_trend():
+    (store, first, fixed, new) = get_store()
+    trend = store.trend('MEDIUM')
+    assert [item['id'] for item in trend] == sorted(item['id'] for item in trend)
+    for run_id in [1, 2]:
+        total = sum(item['findings'] for item in trend if item['id'] == run_id)
+        expected = len([hit for hit in store.diff(0, run_id)['new'] if hit['issue_severity'] == 'MEDIUM'])
+        assert total == expected
+    assert store.trend('MEDIUM', directory='not_exist') == []
+
+
+def test_main_no_command(monkeypatch, tmpdir):
+    exit_mock = ExitMock()
+    monkeypatch.setattr(argparse.ArgumentParser, "exit", exit_mock.exit)
+    monkeypatch.setattr(sys, "argv", ['app.py', '-d', str(tmpdir.join('history.db'))])
+    with pytest.raises(SystemExit):
+        main()
+    assert exit_mock.CALL_ARGS == (-1, "A command is required")
+
+
+def test_main_ingest_file_not_exist(monkeypatch, tmpdir):
+    exit_mock = ExitMock()
+    monkeypatch.setattr(argparse.ArgumentParser, "exit", exit_mock.exit)
+    monkeypatch.setattr(sys, "argv", ['app.py', '-d', str(tmpdir.join('history.db')), 'ingest', 'not_exist.json'])
+    with pytest.raises(SystemExit):
+        main()
+    assert exit_mock.CALL_ARGS == (-2, "File not_exist.json not found")
+
+
+def test_main_commands(monkeypatch, tmpdir):
+    database = str(tmpdir.join('history.db'))
+    out_file = str(tmpdir.join('out.json'))
+    report_file = os.path.join(BASE_PATH, 'report_example.json')
+    commands = [
+        (['ingest', report_file, report_file], [1, 2]),
+        (['runs'], None),
+        (['trend', '--severity', 'HIGH'], None),
+        (['diff', '1', '2'], {"new": [], "fixed": []}),
+        (['first-seen', 'not_exist'], None),
+    ]
+    for (command, expected) in commands:
+        monkeypatch.setattr(sys, "argv", ['app.py', '-d', database, '-o', out_file] + command)
+        main()
+        result = json.load(open(out_file))
+        if expected is not None:
+            assert result == expected
+    monkeypatch.setattr(sys, "argv", ['app.py', '-d', database, '-o', out_file, 'runs'])
+    main()
+    assert len(json.load(open(out_file))) == 2
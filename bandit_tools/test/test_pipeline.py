@@ -0,0 +1,83 @@
+from bandit_tools.baseline_tools import fix
+from bandit_tools.baseline_tools import mix_report
+from bandit_tools.baseline_tools import zip_report
+from bandit_tools.benchmark.generator import generate_report
+from bandit_tools.pipeline import main
+from bandit_tools.pipeline import run_pipeline
+
+import pytest
+
+import argparse
+import json
+import os
+import sys
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+
+
+class ExitMock(object):
+    CALL_ARGS = None
+    CALL_KWARGS = None
+
+    def exit(self, *args, **kwargs):
+        self.CALL_ARGS = args
+        self.CALL_KWARGS = kwargs
+        raise SystemExit()
+
+
+def test_run_pipeline_single_report():
+    report = generate_report(files=3)
+    assert run_pipeline([report]) is report
+
+
+def test_run_pipeline_as_chained_steps():
+    base = generate_report(files=10, hits_per_file=4, duplicate_ratio=0.3)
+    other = generate_report(files=12, hits_per_file=2, seed=2)
+    other['metrics']['empty.py'] = dict(other['metrics']['_totals'], loc=1, nosec=0)
+    for key in other['metrics']['empty.py']:
+        if key not in ['loc', 'nosec']:
+            other['metrics']['empty.py'][key] = 0
+
+    expected = zip_report(fix(mix_report(base, other)))
+    report = run_pipeline([base, other], fix_hits=True, zip_files=True)
+    assert report['results'] == expected['results']
+    assert report['metrics'] == expected['metrics']
+    assert 'empty.py' not in report['metrics']
+
+
+def test_run_pipeline_three_reports():
+    reports = [generate_report(files=5, seed=seed) for seed in range(3)]
+    expected = mix_report(mix_report(reports[0], reports[1]), reports[2])
+    report = run_pipeline(reports)
+    assert report['results'] == expected['results']
+    assert report['metrics'] == expected['metrics']
+
+
+def test_main_file_not_exist(monkeypatch):
+    exit_mock = ExitMock()
+    monkeypatch.setattr(argparse.ArgumentParser, "exit", exit_mock.exit)
+    monkeypatch.setattr(sys, "argv", ['app.py', 'not_exist.json'])
+    with pytest.raises(SystemExit):
+        main()
+    assert exit_mock.CALL_ARGS == (-2, "File not_exist.json not found")
+
+
+def test_main_json_and_html(monkeypatch, tmpdir):
+    out_file = str(tmpdir.join('report.json'))
+    html_file = str(tmpdir.join('report.html'))
+    stats_file = str(tmpdir.join('stats.json'))
+    manual_file = os.path.join(BASE_PATH, 'manual_report_example.json')
+    mix_file = os.path.join(BASE_PATH, 'mix_report_example.json')
+    monkeypatch.setattr(sys, "argv", ['app.py', manual_file, mix_file, '--fix', '--zip',
+                                      '--output', out_file, '--html', html_file, '--stats-file', stats_file])
+    main()
+
+    expected = zip_report(fix(mix_report(json.load(open(manual_file)), json.load(open(mix_file)))))
+    report = json.load(open(out_file))
+    assert report['results'] == expected['results']
+    assert report['metrics'] == expected['metrics']
+    html = open(html_file).read()
+    assert 'id="issue-{}"'.format(len(expected['results'])) in html
+    stats = json.load(open(stats_file))
+    for phase in ['parse', 'mix', 'fix', 'zip', 'serialise', 'render']:
+        assert phase in stats['phases']
@@ -0,0 +1,85 @@
+from bandit_tools import profiling
+from bandit_tools.baseline_tools import BanditReport
+from bandit_tools.baseline_tools import fix
+from bandit_tools.baseline_tools import main
+from bandit_tools.benchmark.generator import generate_report
+
+import json
+import sys
+import os
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_null_profiler_is_noop():
+    profiler = profiling.from_options({})
+    assert profiler is profiling.NULL_PROFILER
+    assert not profiler.enabled
+    with profiler.phase('phase'):
+        profiler.count('counter')
+    funct = BanditReport.get_hash
+    assert profiler.timed('hash', funct) is funct
+
+
+def test_bandit_report_without_profiler_use_static_hash():
+    report = BanditReport()
+    assert 'get_hash' not in vars(report)
+
+
+def test_profiler_phases_and_counters():
+    profiler = profiling.Profiler()
+    profiler.start()
+    with profiler.phase('outer'):
+        with profiler.phase('inner'):
+            pass
+    with profiler.phase('inner'):
+        pass
+    profiler.count_stage('mix', 4, 3)
+    profiler.count_stage('fix', 3, 3)
+    profiler.stop()
+
+    stats = profiler.stats()
+    assert stats['phases']['inner']['calls'] == 2
+    assert stats['phases']['outer']['calls'] == 1
+    assert stats['phases']['outer']['time'] <= stats['total']
+    assert stats['counters'] == {'mix.hits_in': 4, 'mix.hits_out': 3, 'fix.hits_in': 3, 'fix.hits_out': 3}
+    assert stats['dedup_ratio'] == {'mix': 0.25, 'fix': 0.0}
+
+
+def test_profiler_on_fix():
+    profiler = profiling.Profiler()
+    report = json.load(open(os.path.join(BASE_PATH, 'manual_report_example.json')))
+    fix(report, profiler)
+
+    stats = profiler.stats()
+    assert stats['counters']['fix.hits_in'] == len(report['results'])
+    assert stats['counters']['fix.hits_out'] == len(fix(report)['results'])
+    assert stats['phases']['hash']['calls'] == len(report['results'])
+    for phase in ['files', 'hits', 'sort']:
+        assert phase in stats['phases']
+
+
+def test_main_stats_file(monkeypatch, tmpdir):
+    base = generate_report(files=10, hits_per_file=4)
+    other = generate_report(files=10, hits_per_file=2, seed=1)
+    other['results'] += base['results'][:10]
+    base_file = str(tmpdir.join('base.json'))
+    other_file = str(tmpdir.join('other.json'))
+    json.dump(base, open(base_file, 'w'))
+    json.dump(other, open(other_file, 'w'))
+    out_file = str(tmpdir.join('report.json'))
+    stats_file = str(tmpdir.join('stats.json'))
+    profile_file = str(tmpdir.join('report.prof'))
+    monkeypatch.setattr(sys, "argv", ['app.py', base_file, '--mixed', other_file,
+                                      '--fix', '--stats', '--stats-file', stats_file,
+                                      '--profile', profile_file, '--output', out_file])
+    main()
+
+    stats = json.load(open(stats_file))
+    for phase in ['parse', 'mix', 'fix', 'serialise', 'write', 'hash']:
+        assert phase in stats['phases']
+    assert stats['counters']['mix.hits_in'] == 70
+    assert stats['counters']['mix.hits_out'] == 60
+    assert stats['dedup_ratio']['mix'] == 1.0 - 60.0 / 70
+    assert stats['dedup_ratio']['fix'] == 0.0
+    assert os.path.isfile(profile_file)
@@ -0,0 +1,107 @@
+import bandit_tools.custom_report
+from bandit_tools.custom_report import get_environment
+from bandit_tools.custom_report import get_loader_paths
+from bandit_tools.render_cache import RenderCache
+from bandit_tools.benchmark.generator import generate_report
+
+import sys
+import os
+
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+
+
+def get_env():
+    return get_environment(get_loader_paths())
+
+
+def test_render_cache_same_output():
+    env = get_env()
+    report = generate_report(files=5, hits_per_file=4)
+    template = env.get_template('my_report.html')
+    cache = RenderCache(env.get_template('issue.html'))
+
+    expected = template.render(base_uri='', **report)
+    assert template.render(base_uri='', issue_cache=cache, **report) == expected
+    assert cache.misses == 20
+    assert cache.hits == 0
+    assert template.render(base_uri='', issue_cache=cache, **report) == expected
+    assert cache.hits == 20
+
+
+def test_render_cache_issue_no_is_not_cached():
+    env = get_env()
+    issue = generate_report(files=1, hits_per_file=1)['results'][0]
+    cache = RenderCache(env.get_template('issue.html'))
+    assert 'id="issue-1"' in cache.render(issue, 1)
+    assert 'id="issue-7"' in cache.render(issue, 7)
+    assert cache.hits == 1
+
+
+def test_render_cache_lru_eviction():
+    env = get_env()
+    issues = generate_report(files=1, hits_per_file=3, duplicate_ratio=0)['results']
+    cache = RenderCache(env.get_template('issue.html'), max_entries=2)
+    cache.render(issues[0], 1)
+    cache.render(issues[1], 2)
+    cache.render(issues[0], 1)
+    cache.render(issues[2], 3)
+    assert len(cache.entries) == 2
+    cache.render(issues[0], 1)
+    assert cache.hits == 2
+    cache.render(issues[1], 2)
+    assert cache.misses == 4
+
+
+def test_render_cache_max_size():
+    env = get_env()
+    issues = generate_report(files=1, hits_per_file=3, duplicate_ratio=0)['results']
+    cache = RenderCache(env.get_template('issue.html'))
+    fragment = cache.get_fragment(issues[0])
+
+    cache = RenderCache(env.get_template('issue.html'), max_size=len(fragment) * 2)
+    for issue in issues:
+        cache.render(issue, 1)
+    assert len(cache.entries) < 3
+    assert cache.size <= cache.max_size
+    assert cache.size == sum(len(value) for value in cache.entries.values())
+
+
+def test_render_cache_save_and_load(tmpdir):
+    cache_file = str(tmpdir.join('cache.json'))
+    env = get_env()
+    issues = generate_report(files=2, hits_per_file=2)['results']
+    cache = RenderCache(env.get_template('issue.html'))
+    for issue in issues:
+        cache.render(issue, 1)
+    cache.save(cache_file)
+
+    loaded = RenderCache(env.get_template('issue.html'))
+    loaded.load(cache_file)
+    assert loaded.entries == cache.entries
+    assert loaded.size == cache.size
+
+    loaded = RenderCache(env.get_template('issue.html'))
+    loaded.template_hash = 'other'
+    loaded.load(cache_file)
+    assert not loaded.entries
+
+
+def test_render_cache_load_not_exist(tmpdir):
+    cache = RenderCache(get_env().get_template('issue.html'))
+    cache.load(str(tmpdir.join('not_exist.json')))
+    assert not cache.entries
+
+
+def test_main_with_cache(monkeypatch, tmpdir):
+    out_file = str(tmpdir.join('report.html'))
+    cache_file = str(tmpdir.join('cache.json'))
+    expected_file = str(tmpdir.join('expected.html'))
+    report_file = os.path.join(BASE_PATH, 'report_example.json')
+    monkeypatch.setattr(sys, "argv", ['app.py', report_file, '--output', expected_file])
+    bandit_tools.custom_report.main()
+
+    for _ in range(2):
+        monkeypatch.setattr(sys, "argv", ['app.py', report_file, '--cache', cache_file, '--output', out_file])
+        bandit_tools.custom_report.main()
+        assert os.path.isfile(cache_file)
+        assert open(out_file).read() == open(expected_file).read()
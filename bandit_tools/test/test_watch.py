@@ -0,0 +1,192 @@
+from bandit_tools.baseline_tools import mix_report
+from bandit_tools.custom_report import get_environment
+from bandit_tools.custom_report import get_loader_paths
+from bandit_tools.benchmark.generator import generate_report
+from bandit_tools.render_cache import RenderCache
+from bandit_tools.watch import MergedRenderCache
+from bandit_tools.watch import MergedReports
+from bandit_tools.watch import ReportWatcher
+from bandit_tools.watch import main
+
+import pytest
+
+import argparse
+import copy
+import io
+import json
+import os
+import sys
+
+
+class ExitMock(object):
+    CALL_ARGS = None
+    CALL_KWARGS = None
+
+    def exit(self, *args, **kwargs):
+        self.CALL_ARGS = args
+        self.CALL_KWARGS = kwargs
+        raise SystemExit()
+
+
+def mix_all(reports):
+    names = sorted(reports)
+    mixed = reports[names[0]]
+    for name in names[1:]:
+        mixed = mix_report(mixed, reports[name])
+    return mixed
+
+
+def assert_same(merged, reports):
+    expected = mix_all(reports)
+    report = merged.to_dict()
+    assert report['results'] == expected['results']
+    assert report['metrics'] == expected['metrics']
+
+
+def test_merged_reports_as_mix():
+    reports = dict(('report{}'.format(num), generate_report(files=8, duplicate_ratio=0.4, seed=num % 2))
+                   for num in range(3))
+    merged = MergedReports()
+    for name in reports:
+        merged.update(name, reports[name])
+    assert_same(merged, reports)
+
+
+def test_merged_reports_update_and_remove():
+    reports = dict(('report{}'.format(num), generate_report(files=8, duplicate_ratio=0.4, seed=num))
+                   for num in range(3))
+    merged = MergedReports()
+    for name in reports:
+        merged.update(name, reports[name])
+
+    changed = copy.deepcopy(reports['report0'])
+    changed['results'] = changed['results'][5:] + reports['report2']['results'][:3]
+    reports['report0'] = changed
+    merged.update('report0', changed)
+    assert_same(merged, reports)
+
+    merged.remove('report1')
+    del reports['report1']
+    assert_same(merged, reports)
+
+    merged.remove('report0')
+    merged.remove('report2')
+    assert merged.to_dict()['results'] == []
+    assert list(merged.to_dict()['metrics']) == ['_totals']
+
+
+def test_merged_reports_hit_without_metrics():
+    report = generate_report(files=2)
+    report['results'][0]['filename'] = 'unknown.py'
+    with pytest.raises(KeyError):
+        MergedReports().update('report', report)
+
+
+def test_merged_reports_write():
+    reports = {'a': generate_report(files=6, seed=1), 'b': generate_report(files=8, seed=2)}
+    merged = MergedReports()
+    for name in reports:
+        merged.update(name, reports[name])
+    changed = copy.deepcopy(reports['b'])
+    changed['results'][3]['issue_severity'] = 'HIGH'
+    del changed['results'][0]
+    merged.update('b', changed)
+
+    for indent in [None, 2, None]:
+        stream = io.StringIO()
+        merged.write(stream, indent)
+        expected = merged.to_dict()
+        expected['generated_at'] = json.loads(stream.getvalue())['generated_at']
+        assert stream.getvalue() == json.dumps(expected, sort_keys=True, indent=indent, separators=(',', ': '))
+
+    stream = io.StringIO()
+    MergedReports().write(stream, 2)
+    assert json.loads(stream.getvalue())['results'] == []
+
+
+def test_merged_render_cache(monkeypatch):
+    reports = dict(('report{}'.format(num), generate_report(files=4, seed=num)) for num in range(2))
+    merged = MergedReports()
+    for name in reports:
+        merged.update(name, reports[name])
+    env = get_environment(get_loader_paths())
+    template = env.get_template('my_report.html')
+    cache = MergedRenderCache(merged, env.get_template('issue.html'), max_entries=1)
+    monkeypatch.setattr(RenderCache, 'get_fingerprint', None)
+
+    report = merged.to_dict()
+    cache.refresh()
+    assert template.render(base_uri='', issue_cache=cache, **report) == template.render(base_uri='', **report)
+    assert cache.misses == len(merged)
+
+    changed = copy.deepcopy(reports['report0'])
+    changed['results'][0]['issue_text'] = 'Changed text'
+    merged.update('report0', changed)
+    report = merged.to_dict()
+    cache.refresh()
+    html = template.render(base_uri='', issue_cache=cache, **report)
+    assert html == template.render(base_uri='', **report)
+    assert 'Changed text' in html
+    assert cache.misses == len(merged) + 1
+
+
+def test_report_watcher(tmpdir):
+    output = str(tmpdir.join('mixed.json'))
+    watcher = ReportWatcher(str(tmpdir), exclude=[output])
+    assert watcher.poll() == []
+
+    first = str(tmpdir.join('first.json'))
+    json.dump(generate_report(files=3), open(first, 'w'))
+    json.dump({}, open(output, 'w'))
+    tmpdir.join('partial.json').write('{"results": [')
+    assert watcher.poll() == [first]
+    assert watcher.poll() == []
+
+    os.remove(first)
+    assert watcher.poll() == [first]
+    assert watcher.merged.to_dict()['results'] == []
+
+
+def test_report_watcher_skips_invalid_files(tmpdir, capsys):
+    watcher = ReportWatcher(str(tmpdir))
+    report = generate_report(files=3)
+    json.dump(report, open(str(tmpdir.join('report.json')), 'w'))
+    json.dump({"results": []}, open(str(tmpdir.join('other.json')), 'w'))
+    json.dump([1, 2], open(str(tmpdir.join('list.json')), 'w'))
+    orphan = generate_report(files=2, seed=1)
+    orphan['results'][0]['filename'] = 'unknown.py'
+    json.dump(orphan, open(str(tmpdir.join('orphan.json')), 'w'))
+
+    assert watcher.poll() == [str(tmpdir.join('report.json'))]
+    errors = capsys.readouterr().err
+    for name in ['other.json', 'list.json', 'orphan.json']:
+        assert 'Skipped {}'.format(tmpdir.join(name)) in errors
+    assert 'No metrics for unknown.py' in errors
+    assert watcher.merged.to_dict()['results'] == report['results']
+
+    assert watcher.poll() == []
+    assert capsys.readouterr().err == ''
+
+
+def test_main_once(monkeypatch, tmpdir):
+    reports = {'a': generate_report(files=4, seed=1), 'b': generate_report(files=4, seed=2)}
+    for name in reports:
+        json.dump(reports[name], open(str(tmpdir.join(name + '.json')), 'w'))
+    output = str(tmpdir.join('mixed.json'))
+    html = str(tmpdir.join('report.html'))
+    monkeypatch.setattr(sys, "argv", ['app.py', str(tmpdir), '--once', '-o', output, '--html', html])
+    main()
+
+    report = json.load(open(output))
+    assert report['results'] == mix_all(reports)['results']
+    assert 'issue-1' in open(html).read()
+    assert not os.path.exists(output + '.tmp')
+
+
+def test_main_directory_not_exist(monkeypatch):
+    exit_mock = ExitMock()
+    monkeypatch.setattr(argparse.ArgumentParser, "exit", exit_mock.exit)
+    monkeypatch.setattr(sys, "argv", ['app.py', 'not_exist', '-o', 'mixed.json'])
+    with pytest.raises(SystemExit):
+        main()
+    assert exit_mock.CALL_ARGS[0] == -2
@@ -0,0 +1,393 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright 2019 Victor Torre
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+   http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import argparse
+import bisect
+import glob
+import json
+import os
+import sys
+import time
+
+from bandit_tools import custom_report
+from bandit_tools import profiling
+from bandit_tools.baseline_tools import BASE_DICT
+from bandit_tools.baseline_tools import BanditReport
+from bandit_tools.render_cache import RenderCache
+
+
+class MergedReports(object):
+    """
+    Mix of several reports that could be updated or removed one by one.
+    The result is the same as mixing all the reports sorted by name with BanditReport.add_report,
+    but an update only recalculates the changed hits and files of the report.
+    The kept hits are ordered by (filename, report name, position on the file), so the order
+    is updated in place and the JSON of each hit is serialised only once.
+    """
+    MAX_INSORT = 256  # Over this number of changed hits the order is merged instead of updated one by one
+
+    def __init__(self):
+        self.sources = {}
+        self._order = []
+        self._kept = {}
+        self._counts = {}
+        self._files = {}
+        self._file_metrics = {}
+        self._dirty_files = set()
+        self._keys = []
+        self._hits = {}
+        self._fragments = {}
+        self._metric_fragments = {}
+        self._indent = None
+        self._version = 0
+        self._versions = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    @staticmethod
+    def _load(name, report, old=None):
+        """
+        Hits by hash on report order, hits by file and the file data of the report.
+        The hashes of the hits equal to the previous version of the report are not recalculated.
+        """
+        files = {}
+        for filename in report['metrics']:
+            if filename != "_totals":
+                files[filename] = (report['metrics'][filename]['loc'], report['metrics'][filename]['nosec'])
+        by_file = {}
+        for (position, hit) in enumerate(report['results']):
+            for key in ['filename', 'issue_confidence', 'issue_severity']:
+                if key not in hit:
+                    raise KeyError('Hit {} without {}'.format(position, key))
+            if hit['filename'] not in files:
+                raise KeyError('No metrics for {}'.format(hit['filename']))
+            by_file.setdefault(hit['filename'], []).append((hit, None))
+
+        hits = {}
+        for (filename, file_hits) in by_file.items():
+            old_hits = old['by_file'].get(filename, []) if old else []
+            for (index, (hit, _)) in enumerate(file_hits):
+                if index < len(old_hits) and old_hits[index][0] == hit:
+                    hit_hash = old_hits[index][1]
+                else:
+                    hit_hash = BanditReport.get_hash(hit)
+                file_hits[index] = (hit, hit_hash)
+                hits.setdefault(hit_hash, []).append(((filename, name, index), hit))
+        return {'hits': hits, 'files': files, 'by_file': by_file}
+
+    def _count(self, kept, value):
+        for (_, hit) in kept:
+            counts = self._counts.setdefault(hit['filename'], {})
+            self._dirty_files.add(hit['filename'])
+            for key in ["CONFIDENCE.{}".format(hit["issue_confidence"]), "SEVERITY.{}".format(hit["issue_severity"])]:
+                counts[key] = counts.get(key, 0) + value
+
+    def _refresh_hash(self, hit_hash):
+        """Returns the hits kept before and after"""
+        old_kept = self._kept.pop(hit_hash, [])
+        self._count(old_kept, -1)
+        kept = []
+        occurrences = 0
+        for name in self._order:
+            hits = self.sources[name]['hits'].get(hit_hash, [])
+            kept.extend(hits[occurrences:])
+            occurrences = max(occurrences, len(hits))
+        if kept:
+            self._kept[hit_hash] = kept
+            self._count(kept, 1)
+        return (old_kept, kept)
+
+    def _refresh_file(self, filename):
+        self._dirty_files.add(filename)
+        self._files.pop(filename, None)
+        for name in self._order:
+            if filename in self.sources[name]['files']:
+                self._files[filename] = self.sources[name]['files'][filename]
+                break
+
+    def _refresh_order(self, old_keys, new_keys):
+        removed = old_keys - new_keys
+        added = sorted(new_keys - old_keys)
+        if len(removed) + len(added) <= self.MAX_INSORT:
+            for key in removed:
+                del self._keys[bisect.bisect_left(self._keys, key)]
+            for key in added:
+                bisect.insort(self._keys, key)
+        elif removed or added:
+            keys = [key for key in self._keys if key not in removed] if removed else self._keys
+            keys.extend(added)
+            keys.sort()  # Two sorted runs, so it is a merge
+            self._keys = keys
+
+    def _apply(self, name, source):
+        old = self.sources.pop(name, {'hits': {}, 'files': {}})
+        new = source or {'hits': {}, 'files': {}}
+        if source is not None:
+            self.sources[name] = source
+        self._order = sorted(self.sources)
+        old_kept = []
+        new_kept = []
+        for hit_hash in set(old['hits']) | set(new['hits']):
+            if old['hits'].get(hit_hash) == new['hits'].get(hit_hash):
+                continue
+            (hash_old_kept, hash_kept) = self._refresh_hash(hit_hash)
+            old_kept.extend(hash_old_kept)
+            new_kept.extend(hash_kept)
+        # A position of the report could move from one hash to other, so first drop all the old hits
+        new_hits = dict(new_kept)
+        old_hits = dict(old_kept)
+        for (key, hit) in old_kept:
+            del self._hits[key]
+            if new_hits.get(key) != hit:
+                self._fragments.pop(key, None)
+                self._versions.pop(key, None)
+        for (key, hit) in new_kept:
+            if old_hits.get(key) != hit:
+                self._version += 1
+                self._versions[key] = self._version
+        self._hits.update(new_hits)
+        self._refresh_order(set(key for (key, _) in old_kept), set(key for (key, _) in new_kept))
+        for filename in set(old['files']) | set(new['files']):
+            if old['files'].get(filename) != new['files'].get(filename):
+                self._refresh_file(filename)
+
+    def update(self, name, report):
+        """Add the report or replace the previous one with the same name"""
+        self._apply(name, MergedReports._load(name, report, self.sources.get(name)))
+
+    def remove(self, name):
+        if name in self.sources:
+            self._apply(name, None)
+
+    def _refresh_metrics(self):
+        for filename in self._dirty_files:
+            self._metric_fragments.pop(filename, None)
+            if filename not in self._files:
+                self._file_metrics.pop(filename, None)
+                continue
+            file_data = BASE_DICT.copy()
+            (file_data['loc'], file_data['nosec']) = self._files[filename]
+            for (key, value) in self._counts.get(filename, {}).items():
+                file_data[key] += value
+            self._file_metrics[filename] = file_data
+        self._dirty_files = set()
+
+    @property
+    def metrics(self):
+        self._refresh_metrics()
+        metrics = {"_totals": BASE_DICT.copy()}
+        for (filename, file_data) in self._file_metrics.items():
+            metrics[filename] = file_data.copy()
+            for key in file_data:
+                metrics["_totals"][key] += file_data[key]
+        return metrics
+
+    def to_dict(self):
+        return {
+            'metrics': self.metrics,
+            'generated_at': BanditReport().generated_at,
+            'errors': [],
+            'results': [self._hits[key] for key in self._keys],
+        }
+
+    def render_keys(self):
+        """Key of each kept hit by its id, it changes only when the hit changes"""
+        return dict((id(self._hits[key]), (key, self._versions[key])) for key in self._keys)
+
+    def _dumps(self, value, level):
+        data = json.dumps(value, sort_keys=True, indent=self._indent, separators=(',', ': '))
+        if self._indent is None:
+            return data
+        return data.replace('\n', '\n' + ' ' * self._indent * level)
+
+    def _join(self, items, level, brackets):
+        """JSON of a list or dict from the JSON of its items, as json.dumps would write it"""
+        if not items:
+            return brackets
+        if self._indent is None:
+            return brackets[0] + ','.join(items) + brackets[1]
+        (item_sep, end_sep) = ('\n' + ' ' * self._indent * (level + 1), '\n' + ' ' * self._indent * level)
+        return brackets[0] + item_sep + (',' + item_sep).join(items) + end_sep + brackets[1]
+
+    def _fragment(self, key):
+        fragment = self._fragments.get(key)
+        if fragment is None:
+            fragment = self._fragments[key] = self._dumps(self._hits[key], 2)
+        return fragment
+
+    def _metric_fragment(self, filename):
+        fragment = self._metric_fragments.get(filename)
+        if fragment is None:
+            fragment = self._metric_fragments[filename] = self._dumps(self._file_metrics[filename], 2)
+        return fragment
+
+    def write(self, stream, indent=None):
+        """
+        Write the mix as write_report does, the JSON of the hits and files is kept between calls
+        so only the changed ones are serialised again.
+        """
+        if indent != self._indent:
+            self._fragments = {}
+            self._metric_fragments = {}
+            self._indent = indent
+        metrics = self.metrics
+        files = []
+        for filename in sorted(metrics):
+            fragment = self._dumps(metrics[filename], 2) if filename == "_totals" else self._metric_fragment(filename)
+            files.append('{}: {}'.format(json.dumps(filename), fragment))
+        report = [
+            '"errors": []',
+            '"generated_at": {}'.format(json.dumps(BanditReport().generated_at)),
+            '"metrics": {}'.format(self._join(files, 1, '{}')),
+            '"results": {}'.format(self._join([self._fragment(key) for key in self._keys], 1, '[]')),
+        ]
+        stream.write(self._join(report, 0, '{}'))
+
+
+class ReportWatcher(object):
+    """Poll a directory of reports and keep them merged"""
+
+    def __init__(self, directory, pattern='*.json', exclude=None):
+        self.directory = directory
+        self.pattern = pattern
+        self.exclude = set(os.path.abspath(path) for path in exclude or [])
+        self.merged = MergedReports()
+        self.stats = {}
+
+    def poll(self):
+        """
+        Apply the new, changed and removed reports, returns the changed names.
+        A file that is not a valid report is skipped with a warning until it changes,
+        e.g. a report still being written, and the previous version of it is kept on the mix.
+        """
+        changed = []
+        current = set()
+        for path in sorted(glob.glob(os.path.join(self.directory, self.pattern))):
+            path = os.path.abspath(path)
+            if path in self.exclude:
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:  # Removed after the glob
+                continue
+            current.add(path)
+            key = (stat.st_mtime, stat.st_size)
+            if self.stats.get(path) == key:
+                continue
+            self.stats[path] = key
+            try:
+                with open(path) as report_file:
+                    self.merged.update(path, json.load(report_file))
+            except (IOError, ValueError, KeyError, TypeError) as error:
+                sys.stderr.write("Skipped {}: {}: {}\n".format(path, type(error).__name__, error))
+                continue
+            changed.append(path)
+        for path in sorted(set(self.stats) - current):
+            self.merged.remove(path)
+            del self.stats[path]
+            changed.append(path)
+        return changed
+
+
+def write_file(path, write):
+    """Write on a temporary file and rename it, so readers never see a partial file"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as output:
+        write(output)
+    os.rename(tmp_path, path)
+
+
+class MergedRenderCache(RenderCache):
+    """
+    Render cache of the issues of a MergedReports kept on memory between writes.
+    The key is the hit key on the mix and its version, so the issues are not fingerprinted.
+    """
+
+    def __init__(self, merged, template, max_entries=50000):
+        super(MergedRenderCache, self).__init__(template, max_entries)
+        self.merged = merged
+        self.keys = {}
+
+    def refresh(self):
+        """Take the keys of the current hits, call it before rendering the mix"""
+        self.keys = self.merged.render_keys()
+        self.max_entries = max(self.max_entries, len(self.keys))
+
+    def get_key(self, issue):
+        return self.keys[id(issue)]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Tool for keep mixed a directory of Bandit reports, '
+                    'the output is rewritten when a report changes'
+    )
+
+    parser.add_argument("directory", type=str, help="directory with the reports on JSON format")
+    parser.add_argument("-o", "--output", dest="output", type=str, required=True, help="output file of the mix")
+    parser.add_argument("--html", dest="html", type=str, default=None, help="output file for the HTML report")
+    parser.add_argument("--pattern", dest="pattern", type=str, default='*.json',
+                        help="pattern of the report files, by default *.json")
+    parser.add_argument("-i", "--interval", dest="interval", type=float, default=1.0,
+                        help="seconds between checks, by default 1")
+    parser.add_argument("--once", dest="once", default=False, action="store_true",
+                        help="mix the reports and exit")
+    parser.add_argument("-M", "--machine", dest="machine", default=False, action="store_true",
+                        help="Json format without indent")
+    custom_report.add_arguments(parser)
+
+    options = vars(parser.parse_args())
+    if not os.path.isdir(options.get('directory')):
+        parser.exit(-2, "Directory {} not found".format(options.get('directory')))
+
+    template = None
+    if options.get('html'):
+        template = custom_report.get_template(parser, options)
+        if options.get('cache'):
+            sys.stderr.write("The rendered issues are kept on memory, the cache file is not used\n")
+    indent = None if options.get('machine') else 2
+    watcher = ReportWatcher(options.get('directory'), options.get('pattern'),
+                            [options.get('output'), options.get('html')] if options.get('html')
+                            else [options.get('output')])
+    issue_cache = None
+    if template:
+        issue_cache = MergedRenderCache(watcher.merged, template.environment.get_template('issue.html'),
+                                        max_entries=options.get('cache_size'))
+
+    try:
+        while True:
+            started_at = profiling.timer()
+            changed = watcher.poll()
+            if changed:
+                write_file(options.get('output'), lambda output: watcher.merged.write(output, indent))
+                if template:
+                    report = watcher.merged.to_dict()
+                    issue_cache.refresh()
+                    write_file(options.get('html'), lambda output: custom_report.write_html(
+                        report, template, options, profiling.NULL_PROFILER, output, issue_cache))
+                sys.stderr.write("{} reports changed, {} hits written in {:.3f}s\n".format(
+                    len(changed), len(watcher.merged), profiling.timer() - started_at))
+            if options.get('once'):
+                break
+            time.sleep(options.get('interval'))
+    except KeyboardInterrupt:  # pragma: no cover
+        pass
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
@@ -49,6 +49,12 @@ setuptools.setup(
         "console_scripts": [
             "baseline_tools=bandit_tools.baseline_tools:main",
             "bandit_custom_report=bandit_tools.custom_report:main",
-        ]
+            "bandit_history=bandit_tools.history:main",
+            "bandit_pipeline=bandit_tools.pipeline:main",
+            "bandit_watch=bandit_tools.watch:main",
+        ],
+        "bandit.formatters": [
+            "bandit_tools=bandit_tools.formatter:report",
+        ],
     },
 )